@@ -1,11 +1,34 @@
+import argparse
+import concurrent.futures
+import functools
+import logging
+import math
+import os
+import re
+import struct
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
 import pygame
-import random
-import sqlite3
 
-pygame.init()
+from engine import HARD_DROP, LEFT, NOOP, PIECE_COLORS, RIGHT, ROTATE, ROTATIONS, SOFT_DROP, TICKS_PER_SECOND, Game
+from frametime import FrameTimer
+import inputs
+from leaderboard import get_leaderboard
+from persistence import close_database, get_database
+import profiling
+from replay import Recorder, Replay, iter_replay
+from snapshot import restore, snapshot
+
+# 預設的盤面區域像素大小、格子大小 (預覽框與登入畫面也用這個大小) 與盤面格數
 WIDTH, HEIGHT = 400, 760
 CELL_SIZE = 30
-COLUMNS, ROWS = 10, HEIGHT // CELL_SIZE
+COLUMNS, ROWS = 10, 25
+
+# 右側面板寬度與可設定的盤面範圍
+PANEL_WIDTH = 150
+MIN_COLUMNS, MIN_ROWS = 4, 4
+MAX_COLUMNS, MAX_ROWS = 100, 200
 
 # 定義顏色
 COLORS = {
@@ -17,352 +40,592 @@ COLORS = {
     'border': (50, 50, 50)
 }
 
-PIECE_COLORS = [
-    (0, 255, 255),
-    (255, 255, 0),
-    (255, 0, 255),
-    (0, 255, 0), 
-    (255, 100, 100),
-    (100, 100, 255), 
-    (255, 165, 0) 
-]
-
-# 定義方塊形狀
-SHAPES = [
-    [[1, 1, 1, 1]],           # I
-    [[1, 1], [1, 1]],         # O
-    [[0, 1, 1], [1, 1, 0]],   # S
-    [[1, 1, 0], [0, 1, 1]],   # Z
-    [[1, 0, 0], [1, 1, 1]],   # L
-    [[0, 0, 1], [1, 1, 1]],   # J
-    [[0, 1, 0], [1, 1, 1]]    # T
-]
-
-INITIAL_MOVE_DELAY = 200
-MOVE_REPEAT_DELAY = 50 
+GHOST_COLOR = (200, 200, 200)
+
+# 方塊圖塊中空格使用的透明色 (不與任何方塊顏色相同)
+SPRITE_COLORKEY = (255, 0, 128)
+
+# 預覽框顯示的方塊數：下一個以原尺寸顯示，其後的以半尺寸排在下方
+PREVIEW_COUNT = 3
+FONT_NAME = "Arial"
+
+# 渲染模式：'full' 每幀整個重畫，'dirty' 只更新有變化的區域
+RENDER_MODE = 'dirty'
+
+# 渲染上限、每幀最多補跑的 tick 數、計時面板更新與日誌間隔
+RENDER_FPS = 60
+MAX_TICKS_PER_FRAME = 8
+TIMINGS_REFRESH_MS = 500
+FRAME_LOG_INTERVAL_MS = 5000
+
+# 設定 TETRIS_FRAME_LOG=路徑 時將各階段耗時百分位數寫入日誌檔
+FRAME_LOG = os.environ.get('TETRIS_FRAME_LOG')
+
+# 每局錄影的保存位置
+REPLAY_DIR = 'replays'
+
+# 遊戲按鍵對應的引擎動作 (DAS/ARR 等自動重複由 inputs.InputHandler 依事件時間計算)
+KEY_ACTIONS = {
+    pygame.K_LEFT: LEFT,
+    pygame.K_RIGHT: RIGHT,
+    pygame.K_DOWN: SOFT_DROP,
+    pygame.K_UP: ROTATE,
+    pygame.K_SPACE: HARD_DROP,
+}
+
+# 對戰時對手的盤面畫在右側面板之外：每格最多 OPPONENT_CELL 像素，每列最多 OPPONENTS_PER_ROW 個
+OPPONENT_CELL = 12
+OPPONENTS_PER_ROW = 4
+OPPONENT_GAP = 10
+OPPONENT_LABEL = 18
+
+# 登入畫面：游標閃爍間隔、等待圖示的更新間隔，以及沒有動畫時最長的等待時間 (毫秒)
+CURSOR_BLINK_MS = 500
+SPINNER_FRAME_MS = 33
+IDLE_WAIT_MS = 10000
+
+logger = logging.getLogger('tetris.startup')
+replay_logger = logging.getLogger('tetris.replay')
+save_logger = logging.getLogger('tetris.save')
+
+# 錄影檔名只保留文字、數字、底線與連字號，其餘字元 (如路徑分隔符號) 換成底線
+def replay_file_stem(player_name):
+    return re.sub(r'[^\w-]', '_', player_name) or '_'
+
+# 盤面與畫面配置：遊戲規則只看 columns / rows，格子大小由盤面區域的像素大小推得，
+# 視窗縮放時只需重新計算 cell_size
+class Config:
+    def __init__(self, columns=COLUMNS, rows=ROWS, width=WIDTH, height=HEIGHT):
+        if not (MIN_COLUMNS <= columns <= MAX_COLUMNS and MIN_ROWS <= rows <= MAX_ROWS):
+            raise ValueError(f"Board size must be between {MIN_COLUMNS}x{MIN_ROWS} "
+                             f"and {MAX_COLUMNS}x{MAX_ROWS}")
+        self.columns = columns
+        self.rows = rows
+        self.resize(width + PANEL_WIDTH, height)
+
+    # 依視窗大小重新配置 (不小於預設視窗)，格子取能放下整個盤面的最大整數像素
+    def resize(self, window_width, window_height):
+        self.width = max(WIDTH, window_width - PANEL_WIDTH)
+        self.height = max(HEIGHT, window_height)
+        self.cell_size = max(1, min(self.width // self.columns, self.height // self.rows))
+
+    @property
+    def window_size(self):
+        return (self.width + PANEL_WIDTH, self.height)
+
+    # 盤面實際佔用的像素大小
+    @property
+    def board_size(self):
+        return (self.columns * self.cell_size, self.rows * self.cell_size)
+
+# 只初始化用得到的顯示與字型模組 (不含音效等)，匯入本模組時不做任何初始化
+def init_pygame():
+    if not pygame.display.get_init():
+        pygame.display.init()
+    if not pygame.font.get_init():
+        pygame.font.init()
+
+# 字型登錄表：每種 (字型, 大小, 粗體) 只載入一次
+FONTS = {}
+
+def get_font(size=20, bold=False, name=FONT_NAME):
+    key = (name, size, bold)
+    font = FONTS.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.SysFont(name, size, bold=bold)
+        FONTS[key] = font
+    return font
+
+# 以 (字型, 文字, 顏色) 為鍵的 LRU 快取，只有變動的文字 (如分數) 才重新渲染
+@functools.lru_cache(maxsize=256)
+def render_text(text, color, size=20, bold=False, name=FONT_NAME):
+    return get_font(size, bold, name).render(text, True, color)
+
+# 關閉 pygame 並清空字型、文字與登入背景的快取 (這些物件在 pygame.quit() 後即失效，
+# 同一行程再次初始化時不能沿用)
+def quit_pygame():
+    FONTS.clear()
+    render_text.cache_clear()
+    login_background.cache_clear()
+    pygame.quit()
 
 # 新增資料庫初始化函數
 def init_db():
-    conn = sqlite3.connect('tetris.db')
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username TEXT UNIQUE NOT NULL,
-                        password TEXT NOT NULL,
-                        high_score INTEGER DEFAULT 0)''')
-    conn.commit()
-    conn.close()
+    get_database().init_schema()
 
 # 註冊新用戶
 def register_user(username, password):
-    conn = sqlite3.connect('tetris.db')
-    cursor = conn.cursor()
-    try:
-        cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
-    return True
+    return get_database().register_user(username, password)
 
 # 用戶登入
 def login_user(username, password):
-    conn = sqlite3.connect('tetris.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
-    user = cursor.fetchone()
-    conn.close()
-    return user
-
-# 定義方塊類別
-class Brick:
-    def __init__(self):
-        self.shape = random.choice(SHAPES)
-        self.color = random.choice(PIECE_COLORS)
-        self.x = COLUMNS // 2 - len(self.shape[0]) // 2
-        self.y = 0
-
-    def rotate(self):
-        self.shape = [list(row) for row in zip(*self.shape[::-1])]
-
-# 定義俄羅斯方塊遊戲類別
-class Tetris:
-    def __init__(self, player_name):
+    return get_database().login_user(username, password)
+
+# 定義俄羅斯方塊遊戲類別 (規則在 engine.Game，這裡只加上資料庫與鍵盤處理)
+class Tetris(Game):
+    def __init__(self, player_name, seed=None, config=None):
+        self.config = config or Config()
+        super().__init__(seed, self.config.columns, self.config.rows)
         self.player_name = player_name
-        self.grid = [[0] * ROWS for _ in range(COLUMNS)]
-        self.current_brick = Brick()
-        self.next_brick = Brick()
-        self.running = False
-        self.score = 0
         self.high_score = self.load_high_score()
-        self.last_move_time = {'left': 0, 'right': 0}
-        self.key_press_time = {'left': 0, 'right': 0}
-        self.game_over = False
-        self.paused = False
+        self.recorder = Recorder()
+        self.replay_saved = False
+        self.handling = self.load_handling()
 
     # 從資料庫加載高分
     def load_high_score(self):
-        conn = sqlite3.connect('tetris.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT high_score FROM users WHERE username = ?', (self.player_name,))
-        high_score = cursor.fetchone()[0]
-        conn.close()
-        return high_score
-
-    # 保存高分到資料庫
+        return get_database().load_high_score(self.player_name)
+
+    # 保存高分到資料庫 (放入背景寫入佇列，不會阻塞遊戲迴圈)
     def save_high_score(self):
-        conn = sqlite3.connect('tetris.db')
-        cursor = conn.cursor()
-        cursor.execute('UPDATE users SET high_score = ? WHERE username = ?', (self.high_score, self.player_name))
-        conn.commit()
-        conn.close()
-
-    # 處理方塊移動
-    def handle_movement(self, direction, current_time):
-        key_state = pygame.key.get_pressed()
-        dx = -1 if direction == 'left' else 1
-        if (current_time - self.key_press_time[direction] >= INITIAL_MOVE_DELAY and
-            current_time - self.last_move_time[direction] >= MOVE_REPEAT_DELAY):
-            if self.move(dx, 0):
-                self.last_move_time[direction] = current_time
-
-    # 檢查方塊位置是否合法
-    def is_valid_position(self, brick, offset_x=0, offset_y=0):
-        for y, row in enumerate(brick.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    grid_x = brick.x + x + offset_x
-                    grid_y = brick.y + y + offset_y
-                    if (grid_x < 0 or grid_x >= COLUMNS or 
-                        grid_y >= ROWS or 
-                        (grid_y >= 0 and self.grid[grid_x][grid_y])):
-                        return False
-        return True
+        get_database().queue_high_score(self.player_name, self.high_score)
 
-    # 鎖定方塊到網格
-    def lock_brick(self):
-        for y, row in enumerate(self.current_brick.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    self.grid[self.current_brick.x + x][self.current_brick.y + y] = self.current_brick.color
+    # 從資料庫加載操作手感 (DAS/ARR/軟降)，沒有設定過時使用預設值
+    def load_handling(self):
+        row = get_database().load_handling(self.player_name)
+        return inputs.Handling(*row) if row else inputs.Handling()
 
-    # 清除完整的行
+    # 清除完整的行並更新高分
     def clear_lines(self):
-        cleared_lines = 0
-        for y in range(ROWS):
-            if all(self.grid[x][y] for x in range(COLUMNS)):
-                cleared_lines += 1
-                for move_y in range(y, 0, -1):
-                    for x in range(COLUMNS):
-                        self.grid[x][move_y] = self.grid[x][move_y - 1]
-                for x in range(COLUMNS):
-                    self.grid[x][0] = 0
-        
-        self.score += cleared_lines ** 2 * 10
+        cleared_lines = super().clear_lines()
         if self.score > self.high_score:
             self.high_score = self.score
             self.save_high_score()
+        return cleared_lines
 
-    # 生成新方塊
+    # 生成新方塊，遊戲結束時記錄本局、請背景執行緒寫入分數並保存錄影
     def spawn_brick(self):
-        self.current_brick = self.next_brick
-        self.next_brick = Brick()
-        if not self.is_valid_position(self.current_brick):
-            self.running = False
-            self.game_over = True
-
-    # 移動方塊
-    def move(self, dx, dy):
-        if self.is_valid_position(self.current_brick, dx, dy):
-            self.current_brick.x += dx
-            self.current_brick.y += dy
-            return True
-        elif dy:
-            self.lock_brick()
-            self.clear_lines()
-            self.spawn_brick()
-        return False
-
-    # 旋轉方塊
-    def rotate_brick(self):
-        original_shape = self.current_brick.shape[:]
-        self.current_brick.rotate()
-        if not self.is_valid_position(self.current_brick):
-            self.current_brick.shape = original_shape
-
-    # 獲取方塊下落位置
-    def get_drop_position(self):
-        drop_brick = Brick()
-        drop_brick.shape = self.current_brick.shape
-        drop_brick.color = self.current_brick.color
-        drop_brick.x = self.current_brick.x
-        drop_brick.y = self.current_brick.y
-
-        while self.is_valid_position(drop_brick, 0, 1):
-            drop_brick.y += 1
-        
-        return drop_brick
+        super().spawn_brick()
+        if self.game_over:
+            database = get_database()
+            database.queue_game(self.player_name, self.score, self.lines, self.tick / TICKS_PER_SECOND)
+            database.flush(wait=False)
+            self.save_replay()
 
-    # 切換暫停狀態
-    def toggle_pause(self):
-        self.paused = not self.paused
+    # 保存進行中的遊戲 (關閉視窗時)，下次登入時接續
+    def save_game(self):
+        get_database().save_game(self.player_name, snapshot(self))
+
+    # 接續上次保存的遊戲，沒有保存的遊戲時回傳 False；
+    # 無法讀取的存檔 (如快照版本已更新) 直接刪除並開新局，不讓之後每次登入都失敗
+    # (restore 在修改遊戲物件之前就會檢查標頭)
+    def resume(self):
+        database = get_database()
+        data = database.load_game(self.player_name)
+        if data is None:
+            return False
+        try:
+            restore(data, self)
+        except (ValueError, struct.error) as error:
+            save_logger.warning('discarding unreadable save for %s: %s', self.player_name, error)
+            database.delete_game(self.player_name)
+            return False
+        database.delete_game(self.player_name)
+        # 存檔的盤面大小與目前設定不同時，沿用存檔的大小
+        config = self.config
+        if (self.columns, self.rows) != (config.columns, config.rows):
+            self.config = Config(self.columns, self.rows, config.width, config.height)
+        return True
+
+    # 保存本局錄影到 REPLAY_DIR
+    def save_replay(self):
+        if self.replay_saved or not self.tick:
+            return
+        path = os.path.join(REPLAY_DIR, f"{replay_file_stem(self.player_name)}-{self.seed}.trpl")
+        try:
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            Replay.from_game(self, self.player_name).save(path)
+        except OSError as error:
+            # 錄影寫入失敗不應結束遊戲
+            replay_logger.warning('failed to save replay %s: %s', path, error)
+        self.replay_saved = True
 
 # 定義渲染類別
 class Renderer:
-    def __init__(self, screen, game):
+    def __init__(self, screen, game, mode=RENDER_MODE, show_leaderboard=False, config=None):
         self.screen = screen
         self.game = game
-        self.start_button_rect = pygame.Rect(WIDTH + 5, HEIGHT // 2 + 30, 100, 40)
-        self.restart_button_rect = pygame.Rect(WIDTH + 5, HEIGHT // 2 + 100, 100, 40)
-        self.pause_button_rect = pygame.Rect(WIDTH + 5, HEIGHT // 2 + 170, 100, 40)
-        self.preview_pos = (WIDTH + 10, 80)
-        self.score_pos = (WIDTH + 10, 210)
-        self.high_score_pos = (WIDTH + 10, 290)
-        self.hint_pos = (WIDTH + 10, HEIGHT // 2 + 240)
-        self.controls_pos = (WIDTH + 10, HEIGHT // 2 + 280)
-        self.player_name_pos = (WIDTH + 10, 10)
+        self.mode = mode
+        self.config = config or game.config
+        self.cell_sprites = {}
+        self.piece_sprites = {}
+        self.pending = []
+        self.show_leaderboard = show_leaderboard
+        self.leaderboard_version = None
+        self.layout()
+
+    # 依配置計算各元件的位置，並丟棄與畫面大小有關的快取
+    def layout(self):
+        width, height = self.config.width, self.config.height
+        self.start_button_rect = pygame.Rect(width + 5, height // 2 + 30, 100, 40)
+        self.restart_button_rect = pygame.Rect(width + 5, height // 2 + 100, 100, 40)
+        self.pause_button_rect = pygame.Rect(width + 5, height // 2 + 170, 100, 40)
+        self.preview_pos = (width + 10, 80)
+        self.score_pos = (width + 10, 210)
+        self.high_score_pos = (width + 10, 290)
+        self.hint_pos = (width + 10, height // 2 + 220)
+        self.controls_pos = (width + 10, height // 2 + 240)
+        self.player_name_pos = (width + 10, 10)
+        self.score_rect = pygame.Rect(self.score_pos[0], self.score_pos[1], 120, 60)
+        self.high_score_rect = pygame.Rect(self.high_score_pos[0], self.high_score_pos[1], 120, 60)
+        self.preview_rect = pygame.Rect(self.preview_pos[0], self.preview_pos[1], 4 * CELL_SIZE, 4 * CELL_SIZE)
+        self.timings_rect = pygame.Rect(width + 5, 354, 145, 56)
+        board_width = self.config.board_size[0]
+        self.leaderboard_rect = pygame.Rect(15, 150, max(board_width, 300) - 30, 320)
+        self.leaderboard_surface = None
+        self.background = None
+        self.drawn = None
+        self.drawn_rows = None
+        self.overlay = {}
+        self.board_version = None
+        self.panel_values = {}
+        self.last_state = None
+
+    # 視窗大小改變後 (config 已更新) 換上新的畫面並整個重畫；格子圖塊依大小快取，縮放回來時可重用
+    def resize(self, screen):
+        self.screen = screen
+        self.layout()
+        self.pending = 'full'
 
     # 繪製網格
     def draw_grid(self):
+        cell = self.config.cell_size
         pygame.draw.rect(self.screen, COLORS['border'], 
-                        pygame.Rect(0, 0, COLUMNS * CELL_SIZE, ROWS * CELL_SIZE), 2)
+                        pygame.Rect((0, 0), self.config.board_size), 2)
         
-        for x in range(COLUMNS):
-            for y in range(ROWS):
-                color = self.game.grid[x][y] if self.game.grid[x][y] else COLORS['grid']
-                pygame.draw.rect(self.screen, color, 
-                    pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-                pygame.draw.rect(self.screen, COLORS['border'], 
-                    pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE), 1)
+        board = self.game.board
+        self.screen.blits([(self.cell_sprite(board.get(x, y) or 0), (x * cell, y * cell))
+                           for x in range(self.game.columns)
+                           for y in range(self.game.rows)], doreturn=False)
 
     # 繪製分數框
     def draw_score_box(self, pos, label, value):
-        font = pygame.font.SysFont("Arial", 20)
         box_width, box_height = 120, 60
         
         box_rect = pygame.Rect(pos[0], pos[1], box_width, box_height)
         pygame.draw.rect(self.screen, COLORS['grid'], box_rect)
         pygame.draw.rect(self.screen, COLORS['border'], box_rect, 1)
         
-        label_text = font.render(label, True, COLORS['text'])
-        value_text = font.render(str(value), True, COLORS['text'])
+        label_text = render_text(label, COLORS['text'])
+        value_text = render_text(str(value), COLORS['text'])
         self.screen.blit(label_text, (pos[0] + 10, pos[1] + 10))
         self.screen.blit(value_text, (pos[0] + 10, pos[1] + 35))
 
     # 繪製預覽框
     def draw_preview_box(self):
-        font = pygame.font.SysFont("Arial", 20)
-        next_text = font.render("Next:", True, COLORS['text'])
+        next_text = render_text("Next:", COLORS['text'])
         self.screen.blit(next_text, (self.preview_pos[0], self.preview_pos[1] - 30))
 
         self.draw_player_name()
+        self.draw_next_brick()
 
+    # 預覽框中接下來的方塊編號
+    def preview_pieces(self):
+        queue = self.game.queue
+        return tuple(queue.peek(i) for i in range(min(PREVIEW_COUNT, len(queue))))
+
+    # 繪製預覽框中接下來的方塊
+    def draw_next_brick(self):
         preview_size = 4 * CELL_SIZE
-        preview_rect = pygame.Rect(self.preview_pos[0], self.preview_pos[1], 
+        preview_rect = pygame.Rect(self.preview_pos[0], self.preview_pos[1],
                                  preview_size, preview_size)
         pygame.draw.rect(self.screen, COLORS['grid'], preview_rect)
         pygame.draw.rect(self.screen, COLORS['border'], preview_rect, 1)
 
-        brick = self.game.next_brick
-        brick_width = len(brick.shape[0]) * CELL_SIZE
-        brick_height = len(brick.shape) * CELL_SIZE
-        
-        start_x = self.preview_pos[0] + (preview_size - brick_width) // 2
-        start_y = self.preview_pos[1] + (preview_size - brick_height) // 2
-
-        for y, row in enumerate(brick.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    pygame.draw.rect(self.screen, brick.color,
-                        pygame.Rect(start_x + x * CELL_SIZE, start_y + y * CELL_SIZE, 
-                                  CELL_SIZE, CELL_SIZE))
-                    pygame.draw.rect(self.screen, COLORS['border'],
-                        pygame.Rect(start_x + x * CELL_SIZE, start_y + y * CELL_SIZE, 
-                                  CELL_SIZE, CELL_SIZE), 1)
+        pieces = self.preview_pieces()
+        later = pieces[1:]
+        small = CELL_SIZE // 2
+        strip_height = 2 * small + 10 if later else 0
+        self.draw_preview_piece(pieces[0], CELL_SIZE,
+                                pygame.Rect(preview_rect.x, preview_rect.y,
+                                            preview_size, preview_size - strip_height))
+        for i, piece in enumerate(later):
+            slot_width = preview_size // len(later)
+            self.draw_preview_piece(piece, small,
+                                    pygame.Rect(preview_rect.x + i * slot_width,
+                                                preview_rect.bottom - strip_height,
+                                                slot_width, strip_height))
+
+    # 將方塊置中畫在 area 內
+    def draw_preview_piece(self, piece, cell_size, area):
+        layout = ROTATIONS[piece][0]
+        start_x = area.x + (area.width - layout.width * cell_size) // 2
+        start_y = area.y + (area.height - layout.height * cell_size) // 2
+        self.screen.blit(self.piece_sprite(layout, PIECE_COLORS[piece], cell_size), (start_x, start_y))
 
     # 繪製按鈕
     def draw_buttons(self):
-        font = pygame.font.SysFont("Arial", 20)
         
         pygame.draw.rect(self.screen, COLORS['button_start'], self.start_button_rect)
-        start_text = font.render("START", True, COLORS['text'])
+        start_text = render_text("START", COLORS['text'])
         self.screen.blit(start_text, (self.start_button_rect.x + 20, 
                                      self.start_button_rect.y + 10))
 
         pygame.draw.rect(self.screen, COLORS['button_restart'], self.restart_button_rect)
-        restart_text = font.render("RESTART", True, COLORS['text'])
+        restart_text = render_text("RESTART", COLORS['text'])
         self.screen.blit(restart_text, (self.restart_button_rect.x + 5, 
                                       self.restart_button_rect.y + 10))
 
         pygame.draw.rect(self.screen, COLORS['button_start'], self.pause_button_rect)
-        pause_text = font.render("PAUSE", True, COLORS['text'])
+        pause_text = render_text("PAUSE", COLORS['text'])
         self.screen.blit(pause_text, (self.pause_button_rect.x + 20, 
                                      self.pause_button_rect.y + 10))
 
     # 繪製遊戲結束畫面
     def draw_game_over(self):
-        font = pygame.font.SysFont("Arial", 40, bold=True)
-        text = font.render("GAME OVER", True, (255, 0, 0))
-        text_rect = text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
+        text = render_text("GAME OVER", (255, 0, 0), 40, bold=True)
+        text_rect = text.get_rect(center=(self.config.width // 2, self.config.height // 2))
         self.screen.blit(text, text_rect)
 
     # 繪製提示框
     def draw_hint_box(self):
-        font = pygame.font.SysFont("Arial", 16)
-        hint_text = font.render("Press 'START' to begin", True, COLORS['text'])
+        hint_text = render_text("Press 'START' to begin", COLORS['text'], 16)
         self.screen.blit(hint_text, (self.hint_pos[0], self.hint_pos[1]))
 
     # 繪製控制框
     def draw_controls_box(self):
-        font = pygame.font.SysFont("Arial", 16)
         controls_text = [
             "→",
             "←",
             "↓",
             "Up : Rotate",
-            "P: Pause"
+            "Space: Hard drop",
+            "P: Pause",
+            "L: Leaderboard"
         ]
         for i, line in enumerate(controls_text):
-            text = font.render(line, True, COLORS['text'])
+            text = render_text(line, COLORS['text'], 16)
             self.screen.blit(text, (self.controls_pos[0], self.controls_pos[1] + i * 20))
 
     # 繪製玩家名稱
     def draw_player_name(self):
-        font = pygame.font.SysFont("Arial", 20)
-        name_text = font.render(f"Player: {self.game.player_name}", True, COLORS['text'])
+        name_text = render_text(f"Player: {self.game.player_name}", COLORS['text'])
         self.screen.blit(name_text, (self.preview_pos[0], self.preview_pos[1] - 60))
 
-    # 渲染遊戲畫面
-    def render(self):
+    # 對戰時在 origin 畫一個縮小的盤面 (對手)，上方標示名稱，結束的盤面標示 OUT
+    def draw_board(self, game, origin, cell, label):
+        rect = pygame.Rect(origin, (game.columns * cell, game.rows * cell))
+        board = game.board
+        self.screen.set_clip(rect)
+        self.screen.blits([(self.cell_sprite(board.get(x, y) or 0, cell), (rect.x + x * cell, rect.y + y * cell))
+                           for x in range(game.columns)
+                           for y in range(game.rows)], doreturn=False)
+        if game.running:
+            brick = game.current_brick
+            self.screen.blit(self.piece_sprite(brick.layout, brick.color, cell),
+                             (rect.x + brick.x * cell, rect.y + brick.y * cell))
+        self.screen.set_clip(None)
+        pygame.draw.rect(self.screen, COLORS['border'], rect, 1)
+        self.screen.blit(render_text(label, COLORS['text'], 14), (rect.x, rect.y - OPPONENT_LABEL))
+        if game.game_over:
+            text = render_text("OUT", (255, 0, 0), 20, bold=True)
+            self.screen.blit(text, text.get_rect(center=rect.center))
+
+    # 渲染遊戲畫面；present 為 False 時只畫到畫面緩衝，稍後再呼叫 present()
+    def render(self, present=True):
+        if self.mode == 'dirty':
+            self.render_dirty()
+        else:
+            self.render_full()
+        if present:
+            self.present()
+
+    # 將畫好的內容推送到螢幕 (整個翻頁或只更新變更的矩形)
+    def present(self):
+        if self.pending == 'full':
+            pygame.display.flip()
+        elif self.pending:
+            pygame.display.update(self.pending)
+        self.pending = []
+
+    # 繪製計時面板 (傳入空列表則清除)
+    def draw_timings(self, lines):
+        pygame.draw.rect(self.screen, COLORS['background'], self.timings_rect)
+        for i, line in enumerate(lines):
+            text = render_text(line, COLORS['text'], 14)
+            self.screen.blit(text, (self.timings_rect.x, self.timings_rect.y + i * 14))
+        if self.pending != 'full':
+            self.pending.append(self.timings_rect)
+
+    # 排行榜面板 (快取成一張圖，只有排行榜內容變動時才重建)
+    def leaderboard_panel(self):
+        leaderboard = get_leaderboard()
+        version = (leaderboard.version, self.game.player_name)
+        if self.leaderboard_surface is None or self.leaderboard_version != version:
+            rect = self.leaderboard_rect
+            surface = pygame.Surface(rect.size).convert()
+            surface.fill(COLORS['background'])
+            pygame.draw.rect(surface, COLORS['border'], surface.get_rect(), 2)
+            surface.blit(render_text("Leaderboard", COLORS['text'], bold=True), (10, 8))
+            for i, (username, score, lines, duration, played_at) in enumerate(leaderboard.top()):
+                y = 40 + i * 22
+                surface.blit(render_text(f"{i + 1:>2}. {username}", COLORS['text'], 16), (10, y))
+                value = render_text(str(score), COLORS['text'], 16)
+                surface.blit(value, (rect.width - 10 - value.get_width(), y))
+            player = self.game.player_name
+            best = render_text(f"Best: {leaderboard.best(player)}  Rank: #{leaderboard.rank(player)}",
+                               COLORS['text'], 16)
+            surface.blit(best, (10, rect.height - 30))
+            self.leaderboard_surface = surface
+            self.leaderboard_version = version
+        return self.leaderboard_surface
+
+    # 建立快取：空白網格與靜態面板的背景，以及每種格子的圖塊
+    def build_cache(self):
+        screen = self.screen
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.screen = self.background
+        try:
+            self.background.fill(COLORS['background'])
+            pygame.draw.rect(self.background, COLORS['border'],
+                            pygame.Rect((0, 0), self.config.board_size), 2)
+            cell = self.config.cell_size
+            empty = self.cell_sprite(0)
+            self.background.blits([(empty, (x * cell, y * cell))
+                                   for x in range(self.game.columns)
+                                   for y in range(self.game.rows)], doreturn=False)
+            next_text = render_text("Next:", COLORS['text'])
+            self.background.blit(next_text, (self.preview_pos[0], self.preview_pos[1] - 30))
+            self.draw_player_name()
+            self.draw_buttons()
+            self.draw_hint_box()
+            self.draw_controls_box()
+        finally:
+            self.screen = screen
+
+    # 取得格子圖塊 (預設為目前的格子大小)：0 為空格，'ghost' 為落點外框，其餘為方塊顏色
+    def cell_sprite(self, key, cell=None):
+        cell = cell or self.config.cell_size
+        sprite = self.cell_sprites.get((key, cell))
+        if sprite is None:
+            sprite = pygame.Surface((cell, cell)).convert()
+            cell_rect = pygame.Rect(0, 0, cell, cell)
+            sprite.fill(COLORS['grid'] if key in (0, 'ghost') else key)
+            pygame.draw.rect(sprite, COLORS['border'], cell_rect, 1)
+            if key == 'ghost':
+                pygame.draw.rect(sprite, GHOST_COLOR, cell_rect, 1)
+            self.cell_sprites[(key, cell)] = sprite
+        return sprite
+
+    # 整個方塊 (某個旋轉狀態) 預先拼成一張圖塊，空格以 colorkey 透明，一次 blit 即可畫出
+    def piece_sprite(self, layout, key, cell=None):
+        cell = cell or self.config.cell_size
+        sprite = self.piece_sprites.get((layout, key, cell))
+        if sprite is None:
+            sprite = pygame.Surface((layout.width * cell, layout.height * cell)).convert()
+            sprite.fill(SPRITE_COLORKEY)
+            sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+            cell_sprite = self.cell_sprite(key, cell)
+            sprite.blits([(cell_sprite, (x * cell, y * cell)) for x, y in layout.cells], doreturn=False)
+            self.piece_sprites[(layout, key, cell)] = sprite
+        return sprite
+
+    # 只重畫有變化的格子與面板，並以 display.update 推送變更的矩形
+    def render_dirty(self):
+        game = self.game
+        if self.background is None:
+            self.build_cache()
+
+        columns, rows = game.columns, game.rows
+        cell = self.config.cell_size
+        board = game.board
+        state = (game.running, game.game_over, self.show_leaderboard, id(board))
+        full_redraw = self.drawn is None or state != self.last_state
+        if full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            self.drawn = [[0] * rows for _ in range(columns)]
+            self.drawn_rows = [None] * rows
+            self.overlay = {}
+            self.board_version = None
+            self.panel_values = {}
+            self.last_state = state
+
+        overlay = {}
+        if game.running:
+            drop_brick = game.get_drop_position()
+            for x, y in drop_brick.layout.cells:
+                overlay[(drop_brick.x + x, drop_brick.y + y)] = 'ghost'
+            brick = game.current_brick
+            for x, y in brick.layout.cells:
+                overlay[(brick.x + x, brick.y + y)] = brick.color
+
+        candidates = set(self.overlay)
+        candidates.update(overlay)
+        # 盤面變動時只重畫顏色有變化的行 (大盤面鎖定一個方塊通常只動到幾行)
+        if game.board_version != self.board_version:
+            drawn_rows = self.drawn_rows
+            for y in range(rows):
+                colors = board.row_colors(y)
+                if colors != drawn_rows[y]:
+                    drawn_rows[y] = colors
+                    candidates.update((x, y) for x in range(columns))
+            self.board_version = game.board_version
+        self.overlay = overlay
+
+        rects = []
+        sprites = []
+        drawn = self.drawn
+        for x, y in candidates:
+            if not (0 <= x < columns and 0 <= y < rows):
+                continue
+            key = overlay.get((x, y)) or board.get(x, y)
+            if drawn[x][y] != key:
+                drawn[x][y] = key
+                cell_rect = pygame.Rect(x * cell, y * cell, cell, cell)
+                sprites.append((self.cell_sprite(key), cell_rect))
+                rects.append(cell_rect)
+        if sprites:
+            self.screen.blits(sprites, doreturn=False)
+
+        # 排行榜蓋在網格上，底下的格子有變化或內容更新時才重貼
+        if self.show_leaderboard:
+            panel = self.leaderboard_panel()
+            if full_redraw or panel is not self.panel_values.get('leaderboard') or \
+                    self.leaderboard_rect.collidelist(rects) != -1:
+                self.panel_values['leaderboard'] = panel
+                self.screen.blit(panel, self.leaderboard_rect)
+                rects.append(self.leaderboard_rect)
+
+        panels = (
+            ('score', game.score, self.score_rect,
+             lambda: self.draw_score_box(self.score_pos, "Score", game.score)),
+            ('high_score', game.high_score, self.high_score_rect,
+             lambda: self.draw_score_box(self.high_score_pos, "High Score", game.high_score)),
+            ('next', self.preview_pieces(), self.preview_rect, self.draw_next_brick),
+        )
+        for name, value, panel_rect, draw in panels:
+            if self.panel_values.get(name) != value:
+                self.panel_values[name] = value
+                draw()
+                rects.append(panel_rect)
+
+        if full_redraw:
+            if game.game_over:
+                self.draw_game_over()
+            self.pending = 'full'
+        else:
+            self.pending = rects
+
+    # 每幀整個重畫
+    def render_full(self):
+        cell_size = self.config.cell_size
         self.screen.fill(COLORS['background'])
         self.draw_grid()
         
         if self.game.running:
             drop_brick = self.game.get_drop_position()
-            for y, row in enumerate(drop_brick.shape):
-                for x, cell in enumerate(row):
-                    if cell:
-                        pygame.draw.rect(self.screen, 
-                                         (200, 200, 200),
-                                         pygame.Rect((drop_brick.x + x) * CELL_SIZE, 
-                                                     (drop_brick.y + y) * CELL_SIZE, 
-                                                     CELL_SIZE, CELL_SIZE), 1)
-            
-            for y, row in enumerate(self.game.current_brick.shape):
-                for x, cell in enumerate(row):
-                    if cell:
-                        pygame.draw.rect(self.screen, self.game.current_brick.color,
-                            pygame.Rect((self.game.current_brick.x + x) * CELL_SIZE,
-                                      (self.game.current_brick.y + y) * CELL_SIZE, 
-                                      CELL_SIZE, CELL_SIZE))
-                        pygame.draw.rect(self.screen, COLORS['border'],
-                            pygame.Rect((self.game.current_brick.x + x) * CELL_SIZE,
-                                      (self.game.current_brick.y + y) * CELL_SIZE, 
-                                      CELL_SIZE, CELL_SIZE), 1)
-        else:
-            if self.game.game_over:
-                self.draw_game_over()
+            brick = self.game.current_brick
+            self.screen.blits([
+                (self.piece_sprite(drop_brick.layout, 'ghost'), (drop_brick.x * cell_size, drop_brick.y * cell_size)),
+                (self.piece_sprite(brick.layout, brick.color), (brick.x * cell_size, brick.y * cell_size)),
+            ], doreturn=False)
+
+        if self.show_leaderboard:
+            self.screen.blit(self.leaderboard_panel(), self.leaderboard_rect)
+        if not self.game.running and self.game.game_over:
+            self.draw_game_over()
 
         self.draw_score_box(self.score_pos, "Score", self.game.score)
         self.draw_score_box(self.high_score_pos, "High Score", self.game.high_score)
@@ -370,60 +633,93 @@ class Renderer:
         self.draw_buttons()
         self.draw_hint_box()
         self.draw_controls_box()
-        pygame.display.flip()
+        self.pending = 'full'
 
-# 繪製初始畫面
-def draw_initial_screen(screen, input_box, player_name, password_box, password, active_name, active_password, error_message, is_registering):
-    screen.fill(COLORS['background'])
-    font = pygame.font.SysFont("Arial", 40)
-    small_font = pygame.font.SysFont("Arial", 20)
-    
-    title_surface = font.render("Tetris", True, (0, 255, 255))
-    screen.blit(title_surface, (WIDTH // 2 - title_surface.get_width() // 2, HEIGHT // 2 - 250))
+# 登入畫面的靜態背景 (標題、格線與標籤)，只畫一次
+@functools.lru_cache(maxsize=1)
+def login_background(size):
+    background = pygame.Surface(size).convert()
+    background.fill(COLORS['background'])
+
+    title_surface = render_text("Tetris", (0, 255, 255), 40)
+    background.blit(title_surface, (WIDTH // 2 - title_surface.get_width() // 2, HEIGHT // 2 - 250))
 
     for i in range(0, WIDTH, CELL_SIZE):
         for j in range(0, HEIGHT, CELL_SIZE):
-            pygame.draw.rect(screen, COLORS['grid'], pygame.Rect(i, j, CELL_SIZE, CELL_SIZE), 1)
+            pygame.draw.rect(background, COLORS['grid'], pygame.Rect(i, j, CELL_SIZE, CELL_SIZE), 1)
+
+    text_surface = render_text("Enter your name:", COLORS['text'])
+    background.blit(text_surface, (WIDTH // 2 - text_surface.get_width() // 2, HEIGHT // 2 - 150))
+    text_surface = render_text("Enter your password:", COLORS['text'])
+    background.blit(text_surface, (WIDTH // 2 - text_surface.get_width() // 2, HEIGHT // 2 - 50))
+    return background
+
+# 繪製初始畫面 (靜態部分來自快取的背景)；cursor 為 True 時在作用中的輸入框顯示游標
+def draw_initial_screen(screen, input_box, player_name, password_box, password, active_name, active_password, error_message, is_registering, busy=False, cursor=False):
+    screen.blit(login_background(screen.get_size()), (0, 0))
 
-    text_surface = small_font.render("Enter your name:", True, COLORS['text'])
-    screen.blit(text_surface, (WIDTH // 2 - text_surface.get_width() // 2, HEIGHT // 2 - 150))
-    
     color_name = COLORS['text'] if active_name else COLORS['grid']
     pygame.draw.rect(screen, color_name, input_box, 2)
-    name_surface = small_font.render(player_name, True, (255, 255, 255))
+    name_surface = render_text(player_name, (255, 255, 255))
     screen.blit(name_surface, (input_box.x + 5, input_box.y + 5))
     
-    text_surface = small_font.render("Enter your password:", True, COLORS['text'])
-    screen.blit(text_surface, (WIDTH // 2 - text_surface.get_width() // 2, HEIGHT // 2 - 50))
-    
     color_password = COLORS['text'] if active_password else COLORS['grid']
     pygame.draw.rect(screen, color_password, password_box, 2)
-    password_surface = small_font.render('*' * len(password), True, (255, 255, 255))
+    password_surface = render_text('*' * len(password), (255, 255, 255))
     screen.blit(password_surface, (password_box.x + 5, password_box.y + 5))
+
+    if cursor and (active_name or active_password):
+        box, text = (input_box, name_surface) if active_name else (password_box, password_surface)
+        cursor_x = box.x + 7 + text.get_width()
+        pygame.draw.line(screen, COLORS['text'], (cursor_x, box.y + 8), (cursor_x, box.bottom - 8), 2)
     
     if error_message:
-        error_surface = small_font.render(error_message, True, (255, 0, 0))
+        error_surface = render_text(error_message, (255, 0, 0))
         screen.blit(error_surface, (WIDTH // 2 - error_surface.get_width() // 2, HEIGHT // 2 + 50))
     
     button_text = "Register" if is_registering else "Login"
     button_color = COLORS['button_restart'] if is_registering else COLORS['button_start']
     button_rect = pygame.Rect(WIDTH // 2 - 50, HEIGHT // 2 + 100, 100, 50)
     pygame.draw.rect(screen, button_color, button_rect)
-    button_surface = small_font.render(button_text, True, COLORS['text'])
+    button_surface = render_text(button_text, COLORS['text'])
     screen.blit(button_surface, (button_rect.x + (button_rect.width - button_surface.get_width()) // 2, button_rect.y + (button_rect.height - button_surface.get_height()) // 2))
+
+    # 驗證進行中時在按鈕旁顯示旋轉的等待圖示
+    if busy:
+        spinner_rect = pygame.Rect(button_rect.right + 15, button_rect.centery - 12, 24, 24)
+        start = time.perf_counter() * 2 * math.pi % (2 * math.pi)
+        pygame.draw.arc(screen, COLORS['text'], spinner_rect, start, start + 1.5 * math.pi, 3)
     
     # 新增註冊按鈕
     toggle_button_text = "Switch to Login" if is_registering else "Register"
     toggle_button_rect = pygame.Rect(WIDTH // 2 - 75, HEIGHT // 2 + 160, 150, 50)
     pygame.draw.rect(screen, COLORS['button_restart'], toggle_button_rect)
-    toggle_button_surface = small_font.render(toggle_button_text, True, COLORS['text'])
+    toggle_button_surface = render_text(toggle_button_text, COLORS['text'])
     screen.blit(toggle_button_surface, (toggle_button_rect.x + (toggle_button_rect.width - toggle_button_surface.get_width()) // 2, toggle_button_rect.y + (toggle_button_rect.height - toggle_button_surface.get_height()) // 2))
     
     pygame.display.flip()
 
-def main():
-    init_db()
-    screen = pygame.display.set_mode((WIDTH + 150, HEIGHT))
+# 更新用戶的操作手感設定，只覆寫有指定的項目
+def save_handling(username, **changes):
+    database = get_database()
+    row = database.load_handling(username)
+    handling = inputs.Handling(*row) if row else inputs.Handling()
+    handling = inputs.Handling(**{**vars(handling), **changes})
+    database.save_handling(username, handling.das, handling.arr, handling.soft_drop)
+
+def main(config=None, handling=None):
+    started = time.perf_counter()
+    if FRAME_LOG:
+        logging.basicConfig(filename=FRAME_LOG, level=logging.INFO, format='%(asctime)s %(message)s')
+    if profiling.PROFILE_PATH:
+        profiling.enable([(Renderer, 'render')], profiling.PROFILE_PATH)
+    # 密碼雜湊在背景執行緒進行，畫面與輸入不會因此停頓；資料表也在同一執行緒建立，
+    # 登入畫面不必等它，之後送出的登入與註冊會排在建表之後
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='auth')
+    schema = executor.submit(init_db)
+    init_pygame()
+    config = config or Config()
+    screen = pygame.display.set_mode(config.window_size, pygame.RESIZABLE)
     pygame.display.set_caption("Tetris")
     clock = pygame.time.Clock()
     
@@ -435,11 +731,43 @@ def main():
     active_password = False
     error_message = ""
     is_registering = False
+    auth = None
+    first_frame = True
+    redraw = True
+    cursor = True
+    next_blink = time.perf_counter() + CURSOR_BLINK_MS / 1000
 
+    # 只在有輸入事件、游標閃爍或等待驗證時重畫，其餘時間阻塞在 event.wait
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
+        if redraw:
+            draw_initial_screen(screen, input_box, player_name, password_box, password, active_name, active_password, error_message, is_registering, auth is not None, cursor)
+            if first_frame:
+                logger.info('first_frame_ms=%.3f', (time.perf_counter() - started) * 1000)
+                first_frame = False
+            redraw = False
+
+        blinking = active_name or active_password
+        if auth is not None:
+            timeout = SPINNER_FRAME_MS
+        elif blinking:
+            timeout = max(1, int((next_blink - time.perf_counter()) * 1000))
+        else:
+            timeout = IDLE_WAIT_MS
+
+        submit = False
+        for event in wait_events(timeout):
+            if event.type != pygame.MOUSEMOTION:
+                redraw = True
+            if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                cursor = True
+                next_blink = time.perf_counter() + CURSOR_BLINK_MS / 1000
+            if event.type == pygame.VIDEORESIZE:
+                config.resize(event.w, event.h)
+                screen = pygame.display.set_mode(config.window_size, pygame.RESIZABLE)
+            elif event.type == pygame.QUIT:
+                executor.shutdown()
+                close_database()
+                quit_pygame()
                 return
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if input_box.collidepoint(event.pos):
@@ -454,22 +782,7 @@ def main():
                 button_rect = pygame.Rect(WIDTH // 2 - 50, HEIGHT // 2 + 100, 100, 50)
                 toggle_button_rect = pygame.Rect(WIDTH // 2 - 75, HEIGHT // 2 + 160, 150, 50)
                 if button_rect.collidepoint(event.pos):
-                    if is_registering:
-                        if register_user(player_name, password):
-                            error_message = "Please login."
-                            is_registering = False
-                        else:
-                            error_message = "Username already exists."
-                    else:
-                        user = login_user(player_name, password)
-                        if user:
-                            game = Tetris(player_name)
-                            renderer = Renderer(screen, game)
-                            game.running = True
-                            game_loop(screen, clock, game, renderer)
-                            return 
-                        else:
-                            error_message = "Invalid username or password"
+                    submit = True
                 elif toggle_button_rect.collidepoint(event.pos):
                     is_registering = not is_registering
                     error_message = ""
@@ -484,22 +797,7 @@ def main():
                         player_name += event.unicode
                 elif active_password:
                     if event.key == pygame.K_RETURN:
-                        if is_registering:
-                            if register_user(player_name, password):
-                                error_message = "Please login."
-                                is_registering = False
-                            else:
-                                error_message = "Username already exists."
-                        else:
-                            user = login_user(player_name, password)
-                            if user:
-                                game = Tetris(player_name)
-                                renderer = Renderer(screen, game)
-                                game.running = True
-                                game_loop(screen, clock, game, renderer)
-                                return
-                            else:
-                                error_message = "Invalid username or password"
+                        submit = True
                     elif event.key == pygame.K_BACKSPACE:
                         password = password[:-1]
                     else:
@@ -508,68 +806,303 @@ def main():
                     is_registering = not is_registering
                     error_message = ""
 
-        draw_initial_screen(screen, input_box, player_name, password_box, password, active_name, active_password, error_message, is_registering)
-        clock.tick(30)
+        now = time.perf_counter()
+        if blinking and now >= next_blink:
+            cursor = not cursor
+            next_blink = now + CURSOR_BLINK_MS / 1000
+            redraw = True
 
+        if submit and auth is None:
+            action = register_user if is_registering else login_user
+            auth = (is_registering, player_name, executor.submit(action, player_name, password))
+            error_message = ""
+
+        if auth is not None and auth[2].done():
+            registering, name, future = auth
+            auth = None
+            redraw = True
+            schema.result()
+            if registering:
+                if future.result():
+                    error_message = "Please login."
+                    is_registering = False
+                else:
+                    error_message = "Username already exists."
+            elif future.result():
+                executor.shutdown()
+                if handling:
+                    save_handling(name, **handling)
+                game = Tetris(name, config=config)
+                game.resume()
+                renderer = Renderer(screen, game)
+                game.running = True
+                game_loop(screen, clock, game, renderer)
+                return
+            else:
+                error_message = "Invalid username or password"
+        elif auth is not None:
+            redraw = True
+
+# 等待事件 (最多 timeout 毫秒)，再一併取出佇列中其餘的事件
+def wait_events(timeout):
+    event = pygame.event.wait(timeout)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+# 畫面是否需要重畫的狀態鍵 (只有 tick 前進而畫面不變時不重畫)
+def view_state(game):
+    brick = game.current_brick
+    next_brick = game.next_brick
+    return (id(game), brick.piece, brick.rotation, brick.x, brick.y, game.board_version,
+            game.score, game.high_score, next_brick.piece,
+            game.running, game.paused, game.game_over)
+
+# 固定時間步長的主迴圈：模擬以 TICKS_PER_SECOND 推進，渲染最多 RENDER_FPS 且畫面不變時略過；
+# 按鍵事件記下到達時間，在對應的 tick 之前依序套用，延遲不受渲染負載影響
 def game_loop(screen, clock, game, renderer):
-    normal_drop_time = 500
-    fast_drop_time = 15
-    drop_time = normal_drop_time
-    last_drop = pygame.time.get_ticks()
+    tick_ms = 1000 / TICKS_PER_SECOND
+    frame_ms = 1000 / RENDER_FPS
+    timer = FrameTimer()
+    profiler = profiling.ProfileToggle()
+    handler = inputs.InputHandler(game.handling)
+    arrived = []
+    show_timings = False
+    timings_dirty = False
+    leaderboard = get_leaderboard()
+    accumulator = 0.0
+    previous = time.perf_counter() * 1000
+    last_render = previous - frame_ms
+    last_overlay = last_log = previous
+    last_view = None
 
     while True:
-        current_time = pygame.time.get_ticks()
-        
-        for event in pygame.event.get():
+        timer.begin_frame()
+        now = time.perf_counter() * 1000
+        accumulator += now - previous
+        previous = now
+        events = arrived + [(now, event) for event in pygame.event.get()]
+        arrived = []
+
+        for stamp, event in events:
             if event.type == pygame.QUIT:
+                profiler.stop()
                 game.save_high_score()
-                pygame.quit()
+                if game.running:
+                    game.save_game()
+                else:
+                    game.save_replay()
+                close_database()
+                quit_pygame()
                 return
+            elif event.type == pygame.VIDEORESIZE:
+                game.config.resize(event.w, event.h)
+                screen = pygame.display.set_mode(game.config.window_size, pygame.RESIZABLE)
+                renderer.resize(screen)
+                last_view = None
+                timings_dirty = True
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_p:
                     game.toggle_pause()
-                elif game.running and not game.paused:
-                    if event.key == pygame.K_LEFT:
-                        game.key_press_time['left'] = current_time
-                        game.move(-1, 0)
-                    elif event.key == pygame.K_RIGHT:
-                        game.key_press_time['right'] = current_time
-                        game.move(1, 0)
-                    elif event.key == pygame.K_UP:
-                        game.rotate_brick()
+                elif event.key == pygame.K_F3:
+                    show_timings = not show_timings
+                    timings_dirty = True
+                elif event.key == pygame.K_F9:
+                    profiler.toggle()
+                    pygame.display.set_caption("Tetris [cProfile]" if profiler.active else "Tetris")
+                elif event.key == pygame.K_l:
+                    renderer.show_leaderboard = not renderer.show_leaderboard
+                elif event.key in KEY_ACTIONS:
+                    handler.press(KEY_ACTIONS[event.key], stamp)
             elif event.type == pygame.KEYUP:
-                if event.key == pygame.K_LEFT:
-                    game.key_press_time['left'] = 0
-                elif event.key == pygame.K_RIGHT:
-                    game.key_press_time['right'] = 0
+                if event.key in KEY_ACTIONS:
+                    handler.release(KEY_ACTIONS[event.key], stamp)
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_pos = event.pos
                 if renderer.start_button_rect.collidepoint(mouse_pos) and not game.running:
-                    game = Tetris(game.player_name)
-                    renderer = Renderer(screen, game)
+                    game = Tetris(game.player_name, config=game.config)
+                    handler.handling = game.handling
+                    renderer = Renderer(screen, game, show_leaderboard=renderer.show_leaderboard)
                     game.running = True
+                    timings_dirty = True
                 elif renderer.restart_button_rect.collidepoint(mouse_pos):
-                    game = Tetris(game.player_name)
-                    renderer = Renderer(screen, game)
+                    game.save_replay()
+                    game = Tetris(game.player_name, config=game.config)
+                    handler.handling = game.handling
+                    renderer = Renderer(screen, game, show_leaderboard=renderer.show_leaderboard)
                     game.running = True
+                    timings_dirty = True
                 elif renderer.pause_button_rect.collidepoint(mouse_pos) and game.running:
                     game.toggle_pause()
+        timer.lap('input')
 
+        # 依累積時間推進固定 tick，每個 tick 前先套用該 tick 邊界以前到達的輸入；
+        # 落後太多時丟棄積欠的時間，避免越跑越慢
         if game.running and not game.paused:
-            keys = pygame.key.get_pressed()
-            
-            if keys[pygame.K_LEFT] and game.key_press_time['left']:
-                game.handle_movement('left', current_time)
-            if keys[pygame.K_RIGHT] and game.key_press_time['right']:
-                game.handle_movement('right', current_time)
-            
-            drop_time = fast_drop_time if keys[pygame.K_DOWN] else normal_drop_time
-            if current_time - last_drop > drop_time:
-                game.move(0, 1)
-                last_drop = current_time
-        
+            steps = 0
+            while accumulator >= tick_ms and steps < MAX_TICKS_PER_FRAME and game.running:
+                handler.update(game, now - accumulator + tick_ms)
+                game.step()
+                accumulator -= tick_ms
+                steps += 1
+            if steps == MAX_TICKS_PER_FRAME:
+                accumulator = 0.0
+        else:
+            accumulator = 0.0
+        handler.update(game, now)
+        timer.lap('simulate')
+
+        if show_timings and now - last_overlay >= TIMINGS_REFRESH_MS:
+            timings_dirty = True
+        view = view_state(game)
+        if renderer.show_leaderboard:
+            view += (leaderboard.version,)
+        if (view != last_view or timings_dirty) and now - last_render >= frame_ms:
+            renderer.render(present=False)
+            if timings_dirty:
+                renderer.draw_timings(timer.overlay_lines() if show_timings else [])
+                last_overlay = now
+                timings_dirty = False
+            timer.lap('render')
+            renderer.present()
+            timer.lap('flip')
+            last_render = now
+            last_view = view
+        else:
+            timer.skip()
+        timer.end_frame()
+
+        if now - last_log >= FRAME_LOG_INTERVAL_MS:
+            timer.log()
+            last_log = now
+
+        # 等到下一個 tick 或下一次可渲染的時間；期間有事件時立即醒來並記下到達時間
+        wait_ms = tick_ms - accumulator
+        if view != last_view or timings_dirty:
+            wait_ms = min(wait_ms, last_render + frame_ms - now)
+        if wait_ms > 0:
+            events = wait_events(math.ceil(wait_ms))
+            stamp = time.perf_counter() * 1000
+            arrived = [(stamp, event) for event in events]
+
+# 在 Renderer 中播放錄影 (每秒 60 tick 乘上 speed)
+def replay_loop(replay, speed=1):
+    init_pygame()
+    game = replay.new_game()
+    game.player_name = replay.player_name
+    game.high_score = replay.score
+    config = Config(game.columns, game.rows)
+    screen = pygame.display.set_mode(config.window_size, pygame.RESIZABLE)
+    pygame.display.set_caption("Tetris - Replay")
+    clock = pygame.time.Clock()
+
+    renderer = Renderer(screen, game, config=config)
+    frames = iter_replay(replay, game)
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.VIDEORESIZE:
+                config.resize(event.w, event.h)
+                renderer.resize(pygame.display.set_mode(config.window_size, pygame.RESIZABLE))
+            elif event.type == pygame.QUIT:
+                quit_pygame()
+                return
+        for _ in range(speed):
+            next(frames, None)
         renderer.render()
-        clock.tick(60)
+        clock.tick(TICKS_PER_SECOND)
+
+# 鍵盤對戰：frame(game, opponents) 每個 tick 在推進之前呼叫一次，讀取按鍵並畫出自己與對手
+# ([(名稱, 遊戲), ...]) 的盤面，關閉視窗時回傳 False；policy 當作自己遊戲的策略傳給
+# versus.Match 或 versus.VersusClient，由 InputHandler 依按鍵時間套用動作 (DAS/ARR 與單人模式相同)
+class KeyboardPlayer:
+    def __init__(self, name="You", handling=None):
+        self.name = name
+        self.handler = inputs.InputHandler(handling)
+        self.game = None
+        self.screen = None
+        self.renderer = None
+        self.closed = False
+        self.origins = []
+        self.opponent_cell = OPPONENT_CELL
+        self.last_render = 0.0
+
+    # 第一次見到自己的遊戲時 (對戰開始) 依盤面與對手人數開啟視窗
+    def open(self, game, opponents):
+        init_pygame()
+        config = Config(game.columns, game.rows)
+        cell = max(2, min(OPPONENT_CELL, (config.height // 2 - OPPONENT_LABEL - OPPONENT_GAP) // game.rows))
+        board_width = game.columns * cell + OPPONENT_GAP
+        board_height = game.rows * cell + OPPONENT_LABEL + OPPONENT_GAP
+        per_row = min(OPPONENTS_PER_ROW, max(1, len(opponents)))
+        width, height = config.window_size
+        self.origins = [(width + (i % per_row) * board_width, OPPONENT_LABEL + OPPONENT_GAP + i // per_row * board_height)
+                        for i in range(len(opponents))]
+        self.opponent_cell = cell
+        self.screen = pygame.display.set_mode((width + per_row * board_width,
+                                               max(height, -(-len(opponents) // per_row) * board_height + OPPONENT_LABEL)))
+        pygame.display.set_caption("Tetris - Versus")
+        game.player_name = self.name
+        game.high_score = 0
+        self.renderer = Renderer(self.screen, game, 'full', config=config)
+        self.game = game
+
+    def frame(self, game, opponents):
+        if self.closed:
+            return False
+        if game is None:
+            return True
+        if game is not self.game:
+            self.open(game, opponents)
+        for event in pygame.event.get():
+            stamp = time.perf_counter() * 1000
+            if event.type == pygame.QUIT:
+                self.close()
+                return False
+            elif event.type == pygame.KEYDOWN and event.key in KEY_ACTIONS:
+                self.handler.press(KEY_ACTIONS[event.key], stamp)
+            elif event.type == pygame.KEYUP and event.key in KEY_ACTIONS:
+                self.handler.release(KEY_ACTIONS[event.key], stamp)
+
+        now = time.perf_counter() * 1000
+        if now - self.last_render >= 1000 / RENDER_FPS:
+            renderer = self.renderer
+            renderer.render(present=False)
+            for (label, opponent), origin in zip(opponents, self.origins):
+                renderer.draw_board(opponent, origin, self.opponent_cell, label)
+            if not game.running and not game.game_over:
+                text = render_text("YOU WIN", (0, 255, 0), 40, bold=True)
+                self.screen.blit(text, text.get_rect(center=(renderer.config.width // 2, renderer.config.height // 2)))
+            renderer.present()
+            self.last_render = now
+        return True
+
+    # 自己遊戲的策略：套用到目前為止的按鍵，重力由對戰迴圈的 step 處理
+    def policy(self, game, rng):
+        self.handler.update(game, time.perf_counter() * 1000)
+        return NOOP
+
+    def close(self):
+        self.closed = True
+        if self.screen is not None:
+            self.screen = None
+            quit_pygame()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Tetris")
+    parser.add_argument('--columns', type=int, default=COLUMNS)
+    parser.add_argument('--rows', type=int, default=ROWS)
+    parser.add_argument('--das', type=float, help="auto-shift delay in ms (saved for the user)")
+    parser.add_argument('--arr', type=float, help="auto-repeat interval in ms, below 1 = instant (saved for the user)")
+    parser.add_argument('--soft-drop', type=float, help="soft drop interval in ms, below 1 = instant (saved for the user)")
+    args = parser.parse_args()
+    handling = {name: value for name, value in
+                (('das', args.das), ('arr', args.arr), ('soft_drop', args.soft_drop)) if value is not None}
+    for name, value in handling.items():
+        if not value >= 0:
+            parser.error(f"--{name.replace('_', '-')} must be a non-negative number of milliseconds")
+    try:
+        config = Config(args.columns, args.rows)
+    except ValueError as error:
+        parser.error(str(error))
+    main(config, handling)
@@ -0,0 +1,104 @@
+import argparse
+import importlib
+import multiprocessing
+import statistics
+import time
+
+import engine
+from pieces import GENERATORS
+
+# 批次模擬：以多個行程平行跑 N 局指定種子的遊戲，完成一局就回傳一筆結果
+
+# 將 "模組:函式" 字串解析成策略函式 policy(game, rng) -> 動作
+def load_policy(spec):
+    if callable(spec):
+        return spec
+    module_name, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), name)
+
+# 在子行程中跑一局
+def play_one(job):
+    seed, policy, columns, rows, max_ticks, randomizer = job
+    start = time.perf_counter()
+    game = engine.play_game(load_policy(policy), seed, max_ticks, columns=columns, rows=rows,
+                            randomizer=randomizer)
+    return {
+        'seed': seed,
+        'score': game.score,
+        'lines': game.lines,
+        'pieces': game.pieces,
+        'ticks': game.tick,
+        'duration': time.perf_counter() - start,
+    }
+
+# 產生器：每完成一局就產出結果 (完成順序，不保證依種子排序)
+def run_batch(games, seed=0, policy='engine:random_policy', columns=engine.COLUMNS,
+              rows=engine.ROWS, processes=None, max_ticks=100000, chunksize=None,
+              randomizer=engine.RANDOMIZER):
+    load_policy(policy)
+    jobs = [(seed + i, policy, columns, rows, max_ticks, randomizer) for i in range(games)]
+    processes = processes or multiprocessing.cpu_count()
+    if processes == 1:
+        for job in jobs:
+            yield play_one(job)
+        return
+    if chunksize is None:
+        chunksize = max(1, games // (processes * 8))
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(play_one, jobs, chunksize)
+
+# 彙整統計數據
+def summarize(results, elapsed=None):
+    summary = {'games': len(results)}
+    for key in ('score', 'lines', 'pieces', 'ticks'):
+        values = [result[key] for result in results]
+        if not values:
+            continue
+        summary[key] = {
+            'mean': statistics.fmean(values),
+            'median': statistics.median(values),
+            'stdev': statistics.pstdev(values),
+            'min': min(values),
+            'max': max(values),
+        }
+    if elapsed:
+        summary['seconds'] = elapsed
+        summary['games_per_sec'] = len(results) / elapsed
+        summary['pieces_per_sec'] = sum(result['pieces'] for result in results) / elapsed
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many seeded Tetris games in parallel")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', default='engine:random_policy',
+                        help="policy as module:function, called as policy(game, rng) -> action")
+    parser.add_argument('--columns', type=int, default=engine.COLUMNS)
+    parser.add_argument('--rows', type=int, default=engine.ROWS)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--max-ticks', type=int, default=100000)
+    parser.add_argument('--randomizer', choices=sorted(GENERATORS), default=engine.RANDOMIZER)
+    parser.add_argument('--stream', action='store_true', help="print each game as it completes")
+    args = parser.parse_args()
+
+    results = []
+    start = time.perf_counter()
+    for result in run_batch(args.games, args.seed, args.policy, args.columns, args.rows,
+                            args.processes, args.max_ticks, randomizer=args.randomizer):
+        results.append(result)
+        if args.stream:
+            print(f"seed {result['seed']}: score {result['score']}, lines {result['lines']}, "
+                  f"pieces {result['pieces']}, {result['duration'] * 1000:.1f} ms")
+    if not results:
+        return
+    summary = summarize(results, time.perf_counter() - start)
+
+    print(f"games: {summary['games']}  ({summary['games_per_sec']:,.1f} games/s, "
+          f"{summary['pieces_per_sec']:,.0f} pieces/s)")
+    for key in ('score', 'lines', 'pieces', 'ticks'):
+        stats = summary[key]
+        print(f"  {key:>6}: mean {stats['mean']:.2f}  median {stats['median']}  "
+              f"stdev {stats['stdev']:.2f}  min {stats['min']}  max {stats['max']}")
+
+if __name__ == "__main__":
+    main()
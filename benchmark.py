@@ -0,0 +1,706 @@
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import engine
+from board import BOARDS
+from frametime import percentile
+from pieces import GENERATORS, PreviewQueue
+
+# 腳本化盤面：空盤面，以及由底部升起 4 / 12 / 20 行垃圾行的盤面 (缺口位置固定)
+SCRIPTED_BOARDS = {'empty': 0, 'low': 4, 'half': 12, 'high': 20}
+
+# 腳本化輸入 (循環使用)：L 左移、R 右移、U 旋轉、D 軟降、H 硬降、. 不動
+INPUT_SCRIPT = 'LL.U.RRR.D.H..UL.R.DDH.'
+SCRIPT_ACTIONS = {'.': engine.NOOP, 'L': engine.LEFT, 'R': engine.RIGHT, 'U': engine.ROTATE,
+                  'D': engine.SOFT_DROP, 'H': engine.HARD_DROP}
+
+# 回歸比較：依指標名稱判斷越大越好或越小越好，其餘指標不比較
+HIGHER_IS_BETTER = ('_per_sec',)
+LOWER_IS_BETTER = ('_ms', '_us', 'seconds')
+
+# 無頭模擬基準：回報每秒局數與每秒方塊數
+def bench_engine(games=200, seed=0, **kwargs):
+    pieces = 0
+    ticks = 0
+    start = time.perf_counter()
+    for i in range(games):
+        game = engine.play_random_game(seed + i, **kwargs)
+        pieces += game.pieces
+        ticks += game.tick
+    elapsed = time.perf_counter() - start
+    return {
+        'games': games,
+        'seconds': elapsed,
+        'games_per_sec': games / elapsed,
+        'pieces_per_sec': pieces / elapsed,
+        'ticks_per_sec': ticks / elapsed,
+    }
+
+# 比較兩種盤面後端
+def bench_boards(games=200, seed=0):
+    return {name: bench_engine(games, seed, board=name) for name in BOARDS}
+
+# 快照：打包、還原與狀態雜湊的單次耗時 (微秒)
+def bench_snapshot(runs=10000, seed=0):
+    import snapshot
+
+    results = {}
+    for name in BOARDS:
+        game = engine.Game(seed, board=name)
+        rng = random.Random(seed)
+        game.running = True
+        while game.running and game.tick < 2000:
+            game.step(engine.random_policy(game, rng))
+        target = engine.Game(seed, board=name)
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            data = snapshot.snapshot(game)
+        packed = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(runs):
+            snapshot.restore(data, target)
+        restored = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(runs):
+            game.state_hash()
+        hashed = time.perf_counter() - start
+        results[name] = {
+            'bytes': len(data),
+            'snapshot_us': packed / runs * 1e6,
+            'restore_us': restored / runs * 1e6,
+            'hash_us': hashed / runs * 1e6,
+        }
+    return results
+
+def scripted_game(name, seed=0, board='bitboard'):
+    game = engine.Game(seed, board=board)
+    for y in range(SCRIPTED_BOARDS[name]):
+        game.board.insert_garbage(1, y * 3 % game.columns, engine.GARBAGE_COLOR)
+    game.running = True
+    return game
+
+def script_actions(script=INPUT_SCRIPT):
+    return [SCRIPT_ACTIONS[key] for key in script]
+
+# 熱點操作：各腳本化盤面上的碰撞檢查、落點計算 (不使用快取) 與依腳本輸入推進的速度
+# (遊戲結束時從快照還原成初始盤面繼續)
+def bench_hot_paths(runs=20000, ticks=20000, seed=0):
+    import snapshot
+
+    actions = script_actions()
+    results = {}
+    for name in SCRIPTED_BOARDS:
+        game = scripted_game(name, seed)
+        probe = copy.copy(game.current_brick)
+        positions = [(x, y) for x in range(-2, game.columns) for y in range(0, game.rows, 3)]
+        start = time.perf_counter()
+        for i in range(runs):
+            probe.x, probe.y = positions[i % len(positions)]
+            game.is_valid_position(probe)
+        valid_elapsed = time.perf_counter() - start
+
+        brick = game.current_brick
+        spawn_x = brick.x
+        columns = [x for x in range(-2, game.columns) if game.board.is_valid(brick, x, brick.y)]
+        start = time.perf_counter()
+        for i in range(runs):
+            brick.x = columns[i % len(columns)]
+            game.drop_key = None
+            game.get_drop_position()
+        drop_elapsed = time.perf_counter() - start
+        brick.x = spawn_x
+
+        data = snapshot.snapshot(game, events=False)
+        pieces = restarts = 0
+        start = time.perf_counter()
+        for i in range(ticks):
+            game.step(actions[i % len(actions)])
+            if not game.running:
+                pieces += game.pieces
+                restarts += 1
+                snapshot.restore(data, game)
+        script_elapsed = time.perf_counter() - start
+        pieces += game.pieces
+        results[name] = {
+            'is_valid_per_sec': runs / valid_elapsed,
+            'drop_per_sec': runs / drop_elapsed,
+            'ticks_per_sec': ticks / script_elapsed,
+            'pieces_per_sec': pieces / script_elapsed,
+            'restarts': restarts,
+        }
+    return results
+
+# 每幀渲染時間分布：半滿的腳本化盤面依腳本輸入推進，每 tick 渲染一次 (無頭)
+def bench_frames(ticks=2000, seed=0):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import Tetris
+    import snapshot
+    pygame = Tetris.pygame
+    Tetris.init_pygame()
+    pygame.display.set_mode((1, 1))
+
+    actions = script_actions()
+    results = {}
+    for mode in ('dirty', 'full'):
+        game = scripted_game('half', seed)
+        game.player_name = 'bench'
+        game.high_score = 0
+        data = snapshot.snapshot(game, events=False)
+        config = Tetris.Config(game.columns, game.rows)
+        screen = pygame.Surface(config.window_size).convert()
+        renderer = Tetris.Renderer(screen, game, mode, config=config)
+        renderer.render(present=False)
+        times = []
+        for i in range(ticks):
+            game.step(actions[i % len(actions)])
+            if not game.running:
+                snapshot.restore(data, game)
+            start = time.perf_counter()
+            renderer.render(present=False)
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        results[mode] = {
+            'frames_per_sec': len(times) / sum(times) * 1000,
+            'p50_ms': percentile(times, 0.50),
+            'p95_ms': percentile(times, 0.95),
+            'p99_ms': percentile(times, 0.99),
+            'max_ms': times[-1],
+        }
+    return results
+
+# 每幀的繪圖呼叫數 (draw.rect、blit、blits、fill) 與渲染時間：依腳本輸入推進並每個 tick 渲染
+def bench_draw_calls(ticks=600, seed=0):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import Tetris
+    import snapshot
+    pygame = Tetris.pygame
+    Tetris.init_pygame()
+    pygame.display.set_mode((1, 1))
+
+    counts = {'draw_rect': 0, 'blit': 0, 'blits': 0, 'fill': 0}
+
+    class CountingSurface(pygame.Surface):
+        def blit(self, *args, **kwargs):
+            counts['blit'] += 1
+            return super().blit(*args, **kwargs)
+
+        def blits(self, *args, **kwargs):
+            counts['blits'] += 1
+            return super().blits(*args, **kwargs)
+
+        def fill(self, *args, **kwargs):
+            counts['fill'] += 1
+            return super().fill(*args, **kwargs)
+
+    draw_rect = pygame.draw.rect
+
+    def counting_rect(*args, **kwargs):
+        counts['draw_rect'] += 1
+        return draw_rect(*args, **kwargs)
+
+    actions = script_actions()
+    results = {}
+    pygame.draw.rect = counting_rect
+    try:
+        for mode in ('dirty', 'full'):
+            game = scripted_game('half', seed)
+            game.player_name = 'bench'
+            game.high_score = 0
+            data = snapshot.snapshot(game, events=False)
+            config = Tetris.Config(game.columns, game.rows)
+            screen = CountingSurface(config.window_size)
+            renderer = Tetris.Renderer(screen, game, mode, config=config)
+            renderer.render(present=False)
+            for key in counts:
+                counts[key] = 0
+            elapsed = 0.0
+            for i in range(ticks):
+                game.step(actions[i % len(actions)])
+                if not game.running:
+                    snapshot.restore(data, game)
+                start = time.perf_counter()
+                renderer.render(present=False)
+                elapsed += time.perf_counter() - start
+            result = {f'{key}_per_frame': count / ticks for key, count in counts.items()}
+            result['calls_per_frame'] = sum(counts.values()) / ticks
+            result['frame_ms'] = elapsed / ticks * 1000
+            results[mode] = result
+    finally:
+        pygame.draw.rect = draw_rect
+    return results
+
+# 方塊產生器：透過預覽佇列每秒可取出的方塊數
+def bench_randomizers(pieces=1000000, seed=0):
+    results = {}
+    for name, generator in GENERATORS.items():
+        queue = PreviewQueue(generator(random.Random(seed), len(engine.SHAPES)), engine.PREVIEW_SIZE)
+        pop = queue.pop
+        start = time.perf_counter()
+        for _ in range(pieces):
+            pop()
+        results[name] = {'pieces_per_sec': pieces / (time.perf_counter() - start)}
+    return results
+
+# 高盤面多行消除：每輪填滿一半的行後一次清除
+def bench_clear(rows=200, columns=10, rounds=200):
+    results = {}
+    for name, board_class in BOARDS.items():
+        board = board_class(columns, rows)
+        brick = engine.Brick(0, columns)
+        brick.layout = engine.ROTATIONS[0][0]
+        cleared = 0
+        elapsed = 0.0
+        for _ in range(rounds):
+            for y in range(0, rows, 2):
+                for x in range(0, columns, 4):
+                    board.lock(brick, min(x, columns - 4), y)
+            start = time.perf_counter()
+            cleared += len(board.clear_full_rows())
+            elapsed += time.perf_counter() - start
+        results[name] = {
+            'rows': rows,
+            'lines_cleared': cleared,
+            'clears_per_sec': rounds / elapsed,
+        }
+    return results
+
+# 落點枚舉：NumPy 向量化 vs 純 Python，使用貪婪策略玩出的盤面
+def bench_movegen(positions=50, seed=0):
+    import movegen
+
+    boards = []
+    game = engine.Game(seed)
+    rng = random.Random(seed)
+    game.running = True
+    while game.running and len(boards) < positions:
+        game.step(movegen.greedy_policy(game, rng))
+        if game.tick % 10 == 0:
+            boards.append(copy.deepcopy(game))
+
+    start = time.perf_counter()
+    for position in boards:
+        for piece in range(len(engine.SHAPES)):
+            movegen.enumerate_placements_scalar(position, piece)
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for position in boards:
+        board = movegen.board_array(position.board)
+        for piece in range(len(engine.SHAPES)):
+            movegen.enumerate_placements(board, piece)
+    vectorized = time.perf_counter() - start
+
+    evaluations = len(boards) * len(engine.SHAPES)
+    return {
+        'scalar': {'positions_per_sec': evaluations / scalar},
+        'numpy': {'positions_per_sec': evaluations / vectorized, 'speedup': scalar / vectorized},
+    }
+
+# 排行榜查詢：在合成的大量對局資料上比較首次查詢 (走索引) 與快取命中
+def bench_leaderboard(users=1000, games=100000, queries=1000, seed=0):
+    import persistence
+    from leaderboard import Leaderboard
+
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        database = persistence.Database(os.path.join(directory, 'bench.db'))
+        try:
+            start = time.perf_counter()
+            database.init_schema()
+            schema = time.perf_counter() - start
+
+            names = [f'user{i}' for i in range(users)]
+            scores = [(rng.randrange(100000), rng.randrange(200), rng.uniform(10, 600), rng.choice(names))
+                      for _ in range(games)]
+            with database.lock:
+                database.conn.executemany(persistence.INSERT_USER, [(name, '') for name in names])
+                database.conn.executemany(persistence.INSERT_GAME, scores)
+                database.conn.execute('''UPDATE users SET high_score =
+                                         (SELECT MAX(score) FROM games WHERE user_id = users.id)''')
+                database.conn.commit()
+                plan = ' '.join(row[-1] for row in database.conn.execute(
+                    'EXPLAIN QUERY PLAN ' + persistence.SELECT_TOP_GAMES, (10,)))
+
+            start = time.perf_counter()
+            for i in range(queries):
+                database.top_games(10)
+                name = names[i % 10]
+                database.rank_for_score(database.load_high_score(name))
+            uncached = time.perf_counter() - start
+
+            leaderboard = Leaderboard(database)
+            start = time.perf_counter()
+            for i in range(queries):
+                leaderboard.top()
+                leaderboard.rank(names[i % 10])
+            cached = time.perf_counter() - start
+        finally:
+            database.close()
+    return {
+        'games': games,
+        'schema_ms': schema * 1000,
+        'uses_score_index': 'idx_games_score' in plan,
+        'uncached_per_sec': queries / uncached,
+        'cached_per_sec': queries / cached,
+    }
+
+# 驗證期間的幀時間：主執行緒以 60 Hz 推進遊戲，比較在迴圈內同步驗證與交給背景執行緒驗證
+def bench_auth(logins=5, fps=60):
+    from concurrent.futures import ThreadPoolExecutor
+    from frametime import percentile
+    import passwords
+
+    stored = passwords.hash_password('secret')
+    frame = 1 / fps
+    results = {}
+    for mode in ('inline', 'worker'):
+        game = engine.Game(0)
+        game.running = True
+        intervals = []
+        done = 0
+        pending = None
+        start = time.perf_counter()
+        previous = start
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while done < logins:
+                if mode == 'inline':
+                    passwords.verify_password('secret', stored)
+                    done += 1
+                elif pending is None:
+                    pending = executor.submit(passwords.verify_password, 'secret', stored)
+                elif pending.done():
+                    pending = None
+                    done += 1
+                if not game.running:
+                    game = engine.Game(game.seed + 1)
+                    game.running = True
+                game.step()
+                now = time.perf_counter()
+                intervals.append((now - previous) * 1000)
+                previous = now
+                time.sleep(max(0.0, frame - (time.perf_counter() - now)))
+        intervals.sort()
+        results[mode] = {
+            'logins': logins,
+            'login_ms': (time.perf_counter() - start) * 1000 / logins,
+            'frame_p50_ms': percentile(intervals, 0.50),
+            'frame_p99_ms': percentile(intervals, 0.99),
+            'frame_max_ms': intervals[-1],
+        }
+    return results
+
+# 啟動：匯入 Tetris 的耗時與副作用，以及從啟動行程到登入畫面第一幀的時間 (以 dummy 視訊驅動執行)
+def bench_startup(runs=3, timeout=30):
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=root)
+    env.setdefault('SDL_VIDEODRIVER', 'dummy')
+    check = ('import time; start = time.perf_counter(); import Tetris, pygame, os; '
+             'print(time.perf_counter() - start, pygame.get_init() or pygame.display.get_init(), '
+             'os.path.exists("tetris.db"))')
+    imports, wall, first_frame = [], [], []
+    side_effects = False
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', check], cwd=directory, env=env,
+                                    capture_output=True, text=True, check=True).stdout.split()
+            imports.append(float(output[0]) * 1000)
+            side_effects = side_effects or output[1:] != ['False', 'False']
+
+        for _ in range(runs):
+            log = os.path.join(directory, 'frame.log')
+            if os.path.exists(log):
+                os.remove(log)
+            start = time.perf_counter()
+            process = subprocess.Popen([sys.executable, os.path.join(root, 'Tetris.py')], cwd=directory,
+                                       env=dict(env, TETRIS_FRAME_LOG=log),
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                while time.perf_counter() - start < timeout:
+                    text = open(log).read() if os.path.exists(log) else ''
+                    if 'first_frame_ms=' in text:
+                        wall.append((time.perf_counter() - start) * 1000)
+                        first_frame.append(float(text.split('first_frame_ms=')[1].split()[0]))
+                        break
+                    time.sleep(0.002)
+            finally:
+                process.kill()
+                process.wait()
+    return {
+        'import_ms': min(imports),
+        'import_side_effects': side_effects,
+        'first_frame_ms': min(first_frame) if first_frame else None,
+        'launch_to_first_frame_ms': min(wall) if wall else None,
+    }
+
+# 登入畫面閒置時的 CPU 使用率與每秒重畫次數：先完全閒置，再點選名稱輸入框 (游標閃爍)
+# 在暫存目錄中以 dummy 視訊驅動執行 main()，由計時器執行緒送出滑鼠與關閉事件
+def bench_login_idle(seconds=3.0, warmup=0.5):
+    import threading
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import Tetris
+    pygame = Tetris.pygame
+
+    draws = 0
+    draw = Tetris.draw_initial_screen
+    def counting_draw(*args):
+        nonlocal draws
+        draws += 1
+        return draw(*args)
+
+    marks = []
+    def mark(event=None):
+        marks.append((time.perf_counter(), time.process_time(), draws))
+        if event is not None:
+            pygame.event.post(event)
+
+    click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(Tetris.WIDTH // 2, Tetris.HEIGHT // 2 - 75), button=1)
+    timers = [
+        threading.Timer(warmup, mark),
+        threading.Timer(warmup + seconds, mark, (click,)),
+        threading.Timer(warmup + 2 * seconds, mark, (pygame.event.Event(pygame.QUIT),)),
+    ]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        Tetris.draw_initial_screen = counting_draw
+        try:
+            for timer in timers:
+                timer.start()
+            Tetris.main()
+        finally:
+            for timer in timers:
+                timer.cancel()
+            Tetris.draw_initial_screen = draw
+            os.chdir(cwd)
+
+    results = {}
+    for name, (start, end) in (('idle', marks[0:2]), ('cursor', marks[1:3])):
+        elapsed = end[0] - start[0]
+        results[name] = {
+            'cpu_percent': (end[1] - start[1]) / elapsed * 100,
+            'redraws_per_sec': (end[2] - start[2]) / elapsed,
+        }
+    return results
+
+# 不同盤面大小每幀的渲染耗時 (毫秒)：隨機策略每 tick 走一步後渲染一次，比較 dirty 與 full 模式
+def bench_render_sizes(sizes=((10, 25), (20, 50), (50, 100), (100, 200)), frames=600, seed=0):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import Tetris
+    pygame = Tetris.pygame
+    Tetris.init_pygame()
+    pygame.display.set_mode((1, 1))
+
+    results = {}
+    for columns, rows in sizes:
+        config = Tetris.Config(columns, rows)
+        screen = pygame.Surface(config.window_size).convert()
+        for mode in ('dirty', 'full'):
+            rng = random.Random(seed)
+            game = None
+            times = []
+            for i in range(frames):
+                if game is None or not game.running:
+                    game = engine.Game(seed + i, columns, rows)
+                    game.player_name = 'bench'
+                    game.high_score = 0
+                    game.running = True
+                    renderer = Tetris.Renderer(screen, game, mode, config=config)
+                game.step(engine.random_policy(game, rng))
+                start = time.perf_counter()
+                renderer.render(present=False)
+                times.append(time.perf_counter() - start)
+            times.sort()
+            results[f'{columns}x{rows}/{mode}'] = {
+                'cell_size': config.cell_size,
+                'frame_ms': sum(times) / len(times) * 1000,
+                'p99_ms': percentile(times, 0.99) * 1000,
+            }
+    return results
+
+# 對戰：在同一事件迴圈中以替身伺服器跑 players 人的隨機機器人對戰 (即時 60 tick/s)，
+# 回報事件送達延遲與 tick 排程的最大落後
+def bench_versus(players=(2, 8), seed=0):
+    import asyncio
+    import versus
+
+    results = {}
+    for count in players:
+        server, clients = asyncio.run(versus.run_loopback(count, seed))
+        summary = versus.summarize_clients(server.winner, clients)
+        results[f'{count}p'] = {key: summary[key] for key in
+                                ('events', 'desyncs', 'latency_p50_ms', 'latency_p99_ms', 'max_tick_lag_ms')}
+    return results
+
+# 輸入延遲：以不同的幀時間 (模擬渲染負載) 重播同一串時間戳記按鍵，與 1 ms 幀的結果比較；
+# 動作落在哪個 tick 應與幀時間無關 (mismatched_events 為 0)；盤面夠高，整段輸入不會結束遊戲
+def bench_input(frame_times=(1000 / 60, 1000 / 30, 50, 100), presses=2000, seed=0, das=100, arr=5,
+                rows=400):
+    import inputs
+    from replay import Recorder
+
+    tick_ms = 1000 / engine.TICKS_PER_SECOND
+    rng = random.Random(seed)
+    keys = (engine.LEFT, engine.RIGHT, engine.ROTATE, engine.SOFT_DROP)
+    script = []
+    stamp = 0.0
+    for _ in range(presses):
+        stamp += rng.uniform(5, 60)
+        action = rng.choice(keys)
+        script.append((stamp, True, action))
+        script.append((stamp + rng.uniform(1, 300), False, action))
+    script.sort()
+    end = script[-1][0] + tick_ms
+
+    def run(frame_ms):
+        game = engine.Game(seed, rows=rows)
+        game.running = True
+        game.recorder = Recorder()
+        handler = inputs.InputHandler(inputs.Handling(das, arr))
+        pending = iter(script)
+        upcoming = next(pending, None)
+        now = previous = accumulator = 0.0
+        start = time.perf_counter()
+        while now < end:
+            now += frame_ms
+            while upcoming is not None and upcoming[0] <= now:
+                stamp, pressed, action = upcoming
+                (handler.press if pressed else handler.release)(action, stamp)
+                upcoming = next(pending, None)
+            accumulator += now - previous
+            previous = now
+            while accumulator >= tick_ms:
+                handler.update(game, now - accumulator + tick_ms)
+                game.step()
+                accumulator -= tick_ms
+            handler.update(game, now)
+        return game.recorder.events, time.perf_counter() - start
+
+    reference, _ = run(1.0)
+    results = {}
+    for frame_ms in frame_times:
+        events, seconds = run(frame_ms)
+        mismatched = sum(a != b for a, b in zip(events, reference)) + abs(len(events) - len(reference))
+        per_tick = {}
+        for tick, action in events:
+            if action in (engine.LEFT, engine.RIGHT):
+                per_tick[tick] = per_tick.get(tick, 0) + 1
+        results[f'{frame_ms:.0f}ms_frames'] = {
+            'events': len(events),
+            'mismatched_events': mismatched,
+            'max_shifts_per_tick': max(per_tick.values(), default=0),
+            'seconds': seconds,
+        }
+    return results
+
+def print_result(name, result):
+    print(f"[{name}]")
+    for key, value in result.items():
+        if isinstance(value, float):
+            print(f"  {key:>24}: {value:,.2f}")
+        else:
+            print(f"  {key:>24}: {value}")
+
+# 基準項目：名稱 -> 函式(args)，回傳單一結果或 {子項: 結果}
+SUITES = {
+    'engine': lambda args: bench_boards(args.games, args.seed),
+    'randomizer': lambda args: bench_randomizers(seed=args.seed),
+    'snapshot': lambda args: bench_snapshot(seed=args.seed),
+    'clear': lambda args: bench_clear(),
+    'hot': lambda args: bench_hot_paths(seed=args.seed),
+    'frames': lambda args: bench_frames(seed=args.seed),
+    'movegen': lambda args: bench_movegen(seed=args.seed),
+    'leaderboard': lambda args: bench_leaderboard(seed=args.seed),
+    'auth': lambda args: bench_auth(),
+    'startup': lambda args: bench_startup(),
+    'login': lambda args: bench_login_idle(),
+    'render': lambda args: bench_render_sizes(seed=args.seed),
+    'draw': lambda args: bench_draw_calls(seed=args.seed),
+    'versus': lambda args: bench_versus(seed=args.seed),
+    'input': lambda args: bench_input(seed=args.seed),
+}
+
+# 將結果攤平成 {"項目/子項": {指標: 數值}}
+def flatten(name, result):
+    if all(isinstance(value, dict) for value in result.values()):
+        return {f'{name}/{key}': value for key, value in result.items()}
+    return {name: result}
+
+# 執行環境資訊，與結果一起寫入 JSON
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+# 與基準結果比較，回傳退步超過 tolerance 的 (項目, 指標, 舊值, 新值)
+def compare(baseline, results, tolerance):
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            if metric.endswith(HIGHER_IS_BETTER) and value < old * (1 - tolerance):
+                regressions.append((name, metric, old, value))
+            elif metric.endswith(LOWER_IS_BETTER) and value > old * (1 + tolerance):
+                regressions.append((name, metric, old, value))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Tetris benchmarks")
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help=f"Comma-separated suites to run ({','.join(SUITES)})")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Baseline JSON file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(SUITES)
+    for name in names:
+        if name not in SUITES:
+            parser.error(f"Unknown suite {name}")
+
+    results = {}
+    for name in names:
+        try:
+            result = SUITES[name](args)
+        except ImportError as error:
+            print(f"[{name}] skipped ({error.name} is not installed)")
+            continue
+        for key, value in flatten(name, result).items():
+            print_result(key, value)
+            results[key] = value
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(baseline, results, args.tolerance)
+        for name, metric, old, value in regressions:
+            print(f"REGRESSION {name} {metric}: {old:,.3f} -> {value:,.3f}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+# 盤面後端：GridBoard 沿用原本的列表網格，BitBoard 以每行一個整數位元遮罩儲存佔用狀態
+
+# 將形狀轉成每一行的位元遮罩 (bit x 代表第 x 欄)
+def shape_row_masks(shape):
+    return [sum(1 << x for x, cell in enumerate(row) if cell) for row in shape]
+
+# 以欄為主的原始網格 (grid[x][y] 為顏色或 0)
+class GridBoard:
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.grid = [[0] * rows for _ in range(columns)]
+        self.heights = [0] * columns
+
+    def get(self, x, y):
+        return self.grid[x][y]
+
+    # 每行的佔用遮罩 (bit x 代表第 x 欄)
+    def row_occupancy(self):
+        return [sum(1 << x for x, column in enumerate(self.grid) if column[y]) for y in range(self.rows)]
+
+    # 第 y 行所有格子的顏色，可直接比較判斷該行是否有變化
+    def row_colors(self, y):
+        return tuple(column[y] for column in self.grid)
+
+    # 重新計算每欄高度 (只在消行後需要)
+    def recompute_heights(self):
+        rows = self.rows
+        self.heights = [rows - next((y for y, cell in enumerate(column) if cell), rows)
+                        for column in self.grid]
+
+    # 檢查方塊放在 (pos_x, pos_y) 是否合法
+    def is_valid(self, brick, pos_x, pos_y):
+        for x, y in brick.layout.cells:
+            grid_x = pos_x + x
+            grid_y = pos_y + y
+            if (grid_x < 0 or grid_x >= self.columns or
+                grid_y >= self.rows or
+                (grid_y >= 0 and self.grid[grid_x][grid_y])):
+                return False
+        return True
+
+    # 將方塊寫入網格
+    def lock(self, brick, pos_x, pos_y):
+        heights = self.heights
+        for x, y in brick.layout.cells:
+            self.grid[pos_x + x][pos_y + y] = brick.color
+            height = self.rows - pos_y - y
+            if height > heights[pos_x + x]:
+                heights[pos_x + x] = height
+
+    # 一次掃描找出所有滿行並一次壓縮，回傳被清除的行 (由上到下)
+    def clear_full_rows(self, candidates=None):
+        if candidates is None:
+            candidates = range(self.rows)
+        grid = self.grid
+        cleared = [y for y in candidates if all(column[y] for column in grid)]
+        if not cleared:
+            return cleared
+        cleared_set = set(cleared)
+        padding = [0] * len(cleared)
+        for column in grid:
+            column[:] = padding + [cell for y, cell in enumerate(column) if y not in cleared_set]
+        self.recompute_heights()
+        return cleared
+
+    # 由底部升起 lines 行只缺 hole 欄的垃圾行，回傳是否有方塊被推出頂端
+    def insert_garbage(self, lines, hole, color):
+        lines = min(lines, self.rows)
+        overflow = any(column[y] for column in self.grid for y in range(lines))
+        for x, column in enumerate(self.grid):
+            column[:] = column[lines:] + [0 if x == hole else color] * lines
+        self.recompute_heights()
+        return overflow
+
+# BitBoard 的單欄唯讀視圖
+class ColumnView:
+    def __init__(self, board, x):
+        self.board = board
+        self.x = x
+
+    def __len__(self):
+        return self.board.rows
+
+    def __getitem__(self, y):
+        return self.board.get(self.x, y)
+
+    def __iter__(self):
+        for y in range(self.board.rows):
+            yield self.board.get(self.x, y)
+
+# 讓 Renderer 可以照舊使用 grid[x][y] 讀取 BitBoard
+class GridView:
+    def __init__(self, board):
+        self.board = board
+
+    def __len__(self):
+        return self.board.columns
+
+    def __getitem__(self, x):
+        if not 0 <= x < self.board.columns:
+            raise IndexError(x)
+        return ColumnView(self.board, x)
+
+    def __iter__(self):
+        for x in range(self.board.columns):
+            yield ColumnView(self.board, x)
+
+# 每行一個整數遮罩，顏色另外存在緊湊的 bytearray (顏色索引，0 為空)
+class BitBoard:
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.full_row = (1 << columns) - 1
+        self.row_bits = [0] * rows
+        self.colors = bytearray(columns * rows)
+        self.palette = [0]
+        self.palette_index = {}
+        self.heights = [0] * columns
+        self.grid = GridView(self)
+
+    def get(self, x, y):
+        return self.palette[self.colors[y * self.columns + x]]
+
+    def row_occupancy(self):
+        return self.row_bits
+
+    # 第 y 行的顏色索引 (同一盤面的索引不會改變意義)
+    def row_colors(self, y):
+        start = y * self.columns
+        return self.colors[start:start + self.columns]
+
+    # 重新計算每欄高度：由上往下掃描，所有欄位都找到後提早結束
+    def recompute_heights(self):
+        rows = self.rows
+        heights = [0] * self.columns
+        remaining = self.full_row
+        for y, bits in enumerate(self.row_bits):
+            found = bits & remaining
+            while found:
+                low = found & -found
+                heights[low.bit_length() - 1] = rows - y
+                found ^= low
+            remaining &= ~bits
+            if not remaining:
+                break
+        self.heights = heights
+
+    # 顏色轉成色盤索引
+    def color_index(self, color):
+        index = self.palette_index.get(color)
+        if index is None:
+            index = len(self.palette)
+            self.palette.append(color)
+            self.palette_index[color] = index
+        return index
+
+    # 檢查方塊放在 (pos_x, pos_y) 是否合法：每行一次 AND
+    def is_valid(self, brick, pos_x, pos_y):
+        row_bits = self.row_bits
+        for y, mask in enumerate(brick.layout.row_masks):
+            if not mask:
+                continue
+            if pos_x >= 0:
+                shifted = mask << pos_x
+            else:
+                if mask & ((1 << -pos_x) - 1):
+                    return False
+                shifted = mask >> -pos_x
+            if shifted > self.full_row:
+                return False
+            grid_y = pos_y + y
+            if grid_y >= self.rows:
+                return False
+            if grid_y >= 0 and row_bits[grid_y] & shifted:
+                return False
+        return True
+
+    # 將方塊寫入遮罩與顏色平面
+    def lock(self, brick, pos_x, pos_y):
+        index = self.color_index(brick.color)
+        heights = self.heights
+        for x, y in brick.layout.cells:
+            grid_y = pos_y + y
+            self.row_bits[grid_y] |= 1 << (pos_x + x)
+            self.colors[grid_y * self.columns + pos_x + x] = index
+            if self.rows - grid_y > heights[pos_x + x]:
+                heights[pos_x + x] = self.rows - grid_y
+
+    # 與滿行常數比較找出滿行，再以整段複製一次壓縮，回傳被清除的行 (由上到下)
+    def clear_full_rows(self, candidates=None):
+        if candidates is None:
+            candidates = range(self.rows)
+        row_bits = self.row_bits
+        full_row = self.full_row
+        cleared = [y for y in candidates if row_bits[y] == full_row]
+        if not cleared:
+            return cleared
+        columns = self.columns
+        colors = self.colors
+        segments = [bytes(len(cleared) * columns)]
+        start = 0
+        for y in cleared:
+            segments.append(colors[start * columns:y * columns])
+            start = y + 1
+        segments.append(colors[start * columns:])
+        colors[:] = b''.join(segments)
+        row_bits[:] = [0] * len(cleared) + [bits for bits in row_bits if bits != full_row]
+        self.recompute_heights()
+        return cleared
+
+    # 由底部升起垃圾行：遮罩與顏色平面各整段平移一次
+    def insert_garbage(self, lines, hole, color):
+        lines = min(lines, self.rows)
+        overflow = any(self.row_bits[:lines])
+        columns = self.columns
+        row = bytearray([self.color_index(color)]) * columns
+        row[hole] = 0
+        self.colors[:] = self.colors[lines * columns:] + row * lines
+        self.row_bits[:] = self.row_bits[lines:] + [self.full_row & ~(1 << hole)] * lines
+        self.recompute_heights()
+        return overflow
+
+BOARDS = {
+    'grid': GridBoard,
+    'bitboard': BitBoard,
+}
@@ -0,0 +1,320 @@
+import copy
+import hashlib
+import random
+import struct
+
+from board import BOARDS, shape_row_masks
+from pieces import GENERATORS, PreviewQueue
+
+# 純 Python 的遊戲核心：不依賴 pygame、資料庫或系統時鐘，可無頭高速執行
+COLUMNS, ROWS = 10, 25
+
+# 方塊顏色，與 SHAPES 依編號一一對應
+PIECE_COLORS = [
+    (0, 255, 255),    # I
+    (255, 255, 0),    # O
+    (0, 255, 0),      # S
+    (255, 100, 100),  # Z
+    (255, 165, 0),    # L
+    (100, 100, 255),  # J
+    (255, 0, 255)     # T
+]
+
+# 定義方塊形狀
+SHAPES = [
+    [[1, 1, 1, 1]],           # I
+    [[1, 1], [1, 1]],         # O
+    [[0, 1, 1], [1, 1, 0]],   # S
+    [[1, 1, 0], [0, 1, 1]],   # Z
+    [[1, 0, 0], [1, 1, 1]],   # L
+    [[0, 0, 1], [1, 1, 1]],   # J
+    [[0, 1, 0], [1, 1, 1]]    # T
+]
+
+# 動作代碼 (供 step 使用)
+NOOP, LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP = range(6)
+ACTIONS = (NOOP, LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP)
+
+# 預設的方塊產生器與預覽佇列長度
+RANDOMIZER = 'bag'
+PREVIEW_SIZE = 5
+
+# 狀態雜湊涵蓋的方塊資訊 (方塊編號, 旋轉, x, y)
+HASH_BRICK = struct.Struct('<BBhh')
+
+# 對戰：垃圾行的顏色，以及一次消除 0~4 行送出的垃圾行數
+GARBAGE_COLOR = (128, 128, 128)
+ATTACK_TABLE = (0, 0, 1, 2, 4)
+
+# 每秒 tick 數與重力間隔 (30 tick = 原本的 500ms)
+TICKS_PER_SECOND = 60
+GRAVITY_TICKS = 30
+
+# 預先計算的單一旋轉狀態：填滿格子的偏移、外框與每行遮罩
+class Rotation:
+    __slots__ = ('shape', 'cells', 'width', 'height', 'row_masks', 'column_bottoms')
+
+    def __init__(self, shape):
+        self.shape = tuple(tuple(row) for row in shape)
+        self.cells = tuple((x, y) for y, row in enumerate(shape) for x, cell in enumerate(row) if cell)
+        self.width = len(shape[0])
+        self.height = len(shape)
+        self.row_masks = tuple(shape_row_masks(shape))
+        self.column_bottoms = tuple((x, max(y for cx, y in self.cells if cx == x))
+                                    for x in range(self.width))
+
+# 啟動時建立每種形狀 × 4 個旋轉的查表
+def build_rotation_table(shapes):
+    table = []
+    for shape in shapes:
+        rotations = []
+        for _ in range(4):
+            rotations.append(Rotation(shape))
+            shape = [list(row) for row in zip(*shape[::-1])]
+        table.append(tuple(rotations))
+    return tuple(table)
+
+ROTATIONS = build_rotation_table(SHAPES)
+
+# 定義方塊類別：只記錄方塊編號與旋轉索引
+class Brick:
+    def __init__(self, piece, columns=COLUMNS):
+        self.piece = piece
+        self.color = PIECE_COLORS[piece]
+        self.rotation = 0
+        self.layout = ROTATIONS[self.piece][0]
+        self.x = columns // 2 - self.layout.width // 2
+        self.y = 0
+
+    @property
+    def shape(self):
+        return self.layout.shape
+
+    def rotate(self, turns=1):
+        self.rotation = (self.rotation + turns) % 4
+        self.layout = ROTATIONS[self.piece][self.rotation]
+
+# 定義遊戲規則類別
+class Game:
+    def __init__(self, seed=None, columns=COLUMNS, rows=ROWS, gravity_ticks=GRAVITY_TICKS, board='bitboard',
+                 randomizer=RANDOMIZER, preview=PREVIEW_SIZE):
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.columns = columns
+        self.rows = rows
+        self.gravity_ticks = gravity_ticks
+        self.board = BOARDS[board](columns, rows)
+        self.randomizer = randomizer
+        self.queue = PreviewQueue(GENERATORS[randomizer](self.rng, len(SHAPES)), preview)
+        self.current_brick = Brick(self.queue.pop(), columns)
+        self.next_brick = self.new_brick()
+        self.running = False
+        self.score = 0
+        self.lines = 0
+        self.pieces = 0
+        self.board_version = 0
+        self.cleared_rows = []
+        self.drop_key = None
+        self.drop_brick = None
+        self.recorder = None
+        self.tick = 0
+        self.drop_timer = 0
+        self.game_over = False
+        self.paused = False
+        self.garbage = []
+        self.attack = 0
+        self.topped_out = False
+
+    # 預覽佇列最前面 (下一個出場) 的方塊
+    def new_brick(self):
+        return Brick(self.queue.peek(), self.columns)
+
+    # 盤面的網格視圖 (grid[x][y] 為顏色或 0)
+    @property
+    def grid(self):
+        return self.board.grid
+
+    # 檢查方塊位置是否合法
+    def is_valid_position(self, brick, offset_x=0, offset_y=0):
+        return self.board.is_valid(brick, brick.x + offset_x, brick.y + offset_y)
+
+    # 鎖定方塊到網格
+    def lock_brick(self):
+        brick = self.current_brick
+        self.board.lock(brick, brick.x, brick.y)
+        self.pieces += 1
+        self.board_version += 1
+
+    # 清除剛鎖定方塊所在的滿行，回傳清除的行數；被清除的行記錄在 cleared_rows
+    def clear_lines(self):
+        brick = self.current_brick
+        top = max(brick.y, 0)
+        bottom = min(brick.y + brick.layout.height, self.rows)
+        self.cleared_rows = self.board.clear_full_rows(range(top, bottom))
+        cleared_lines = len(self.cleared_rows)
+        self.lines += cleared_lines
+        self.score += cleared_lines ** 2 * 10
+        return cleared_lines
+
+    # 對戰：接收 lines 行缺口在 hole 欄的垃圾行，在下一次沒有消行的鎖定時升上盤面
+    def receive_garbage(self, lines, hole):
+        self.garbage.append((lines, hole))
+
+    # 取出累積的攻擊行數 (由對戰的一方轉送給對手)
+    def take_attack(self):
+        attack = self.attack
+        self.attack = 0
+        return attack
+
+    # 消行產生的攻擊先抵銷待接收的垃圾行，剩下的才送出；沒有消行時待接收的垃圾行全部升上盤面
+    def exchange_garbage(self, cleared_lines):
+        if cleared_lines:
+            attack = ATTACK_TABLE[min(cleared_lines, len(ATTACK_TABLE) - 1)]
+            while attack and self.garbage:
+                lines, hole = self.garbage[0]
+                if attack >= lines:
+                    attack -= lines
+                    del self.garbage[0]
+                else:
+                    self.garbage[0] = (lines - attack, hole)
+                    attack = 0
+            self.attack += attack
+        elif self.garbage:
+            for lines, hole in self.garbage:
+                if self.board.insert_garbage(lines, hole, GARBAGE_COLOR):
+                    self.topped_out = True
+            self.garbage = []
+            self.board_version += 1
+
+    # 生成新方塊 (被垃圾行推出頂端時也算遊戲結束)
+    def spawn_brick(self):
+        self.current_brick = self.next_brick
+        self.queue.pop()
+        self.next_brick = self.new_brick()
+        if self.topped_out or not self.is_valid_position(self.current_brick):
+            self.running = False
+            self.game_over = True
+
+    # 移動方塊
+    def move(self, dx, dy):
+        if self.is_valid_position(self.current_brick, dx, dy):
+            self.current_brick.x += dx
+            self.current_brick.y += dy
+            return True
+        elif dy:
+            self.lock_brick()
+            self.exchange_garbage(self.clear_lines())
+            self.spawn_brick()
+        return False
+
+    # 旋轉方塊
+    def rotate_brick(self):
+        self.current_brick.rotate()
+        if not self.is_valid_position(self.current_brick):
+            self.current_brick.rotate(-1)
+            return False
+        return True
+
+    # 計算方塊直落後的 y：方塊位於各欄頂端之上時只需查高度表 O(方塊寬度)，
+    # 若方塊已卡在懸空結構下方則退回逐行探測
+    def drop_y(self, brick):
+        rows = self.rows
+        heights = self.board.heights
+        landing = rows
+        for x, bottom in brick.layout.column_bottoms:
+            top = rows - heights[brick.x + x]
+            if brick.y + bottom >= top:
+                break
+            landing = min(landing, top - 1 - bottom)
+        else:
+            return landing
+
+        y = brick.y
+        while self.board.is_valid(brick, brick.x, y + 1):
+            y += 1
+        return y
+
+    # 獲取方塊下落位置 (方塊移動、旋轉或盤面改變時才重新計算)
+    def get_drop_position(self):
+        brick = self.current_brick
+        key = (brick.piece, brick.rotation, brick.x, brick.y, self.board_version)
+        if key != self.drop_key:
+            drop_brick = copy.copy(brick)
+            drop_brick.y = self.drop_y(brick)
+            self.drop_key = key
+            self.drop_brick = drop_brick
+        return self.drop_brick
+
+    # 直接落到底並鎖定
+    def hard_drop(self):
+        self.current_brick.y = self.get_drop_position().y
+        self.move(0, 1)
+        self.drop_timer = 0
+
+    # 64 位元狀態雜湊：盤面佔用、目前方塊的位置與預覽佇列，跨行程穩定
+    # (可做為置換表的鍵，也用於核對重播結果)
+    def state_hash(self):
+        width = (self.columns + 7) // 8
+        brick = self.current_brick
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(b''.join(bits.to_bytes(width, 'little') for bits in self.board.row_occupancy()))
+        digest.update(HASH_BRICK.pack(brick.piece, brick.rotation, brick.x, brick.y))
+        digest.update(bytes(self.queue.peek(i) for i in range(len(self.queue))))
+        return int.from_bytes(digest.digest(), 'little')
+
+    # 切換暫停狀態
+    def toggle_pause(self):
+        self.paused = not self.paused
+
+    # 立即套用一個動作 (不推進 tick)，有錄影器時記錄 (tick, 動作)
+    def apply(self, action):
+        if not self.running or self.paused or action == NOOP:
+            return False
+        if self.recorder is not None:
+            self.recorder.record(self.tick, action)
+
+        if action == LEFT:
+            return self.move(-1, 0)
+        elif action == RIGHT:
+            return self.move(1, 0)
+        elif action == ROTATE:
+            return self.rotate_brick()
+        elif action == SOFT_DROP:
+            self.drop_timer = 0
+            return self.move(0, 1)
+        elif action == HARD_DROP:
+            self.hard_drop()
+            return True
+        return False
+
+    # 推進一個 tick：先套用動作，再處理重力
+    def step(self, action=NOOP):
+        if not self.running or self.paused:
+            return self.game_over
+
+        self.apply(action)
+        self.tick += 1
+        self.drop_timer += 1
+        if self.running and self.drop_timer >= self.gravity_ticks:
+            self.move(0, 1)
+            self.drop_timer = 0
+        return self.game_over
+
+# 隨機策略：每個 tick 隨機選一個動作
+def random_policy(game, rng):
+    return rng.choice(ACTIONS)
+
+# 以策略 policy(game, rng) -> 動作 跑一局，回傳遊戲物件
+def play_game(policy, seed=None, max_ticks=100000, **kwargs):
+    game = Game(seed, **kwargs)
+    rng = random.Random(game.seed)
+    game.running = True
+    while game.running and game.tick < max_ticks:
+        game.step(policy(game, rng))
+    return game
+
+# 以隨機策略跑一局 (供測試與基準使用)
+def play_random_game(seed=None, max_ticks=100000, **kwargs):
+    return play_game(random_policy, seed, max_ticks, **kwargs)
@@ -0,0 +1,74 @@
+import collections
+import logging
+import math
+import time
+
+# 每幀各階段耗時 (毫秒) 的滑動視窗統計，供畫面上的計時面板與日誌使用
+PHASES = ('input', 'simulate', 'render', 'flip')
+
+logger = logging.getLogger('tetris.frametime')
+
+# 最近排名法的百分位數 (values 需已排序)
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+class FrameTimer:
+    def __init__(self, window=600, phases=PHASES):
+        self.phases = phases
+        self.samples = {phase: collections.deque(maxlen=window) for phase in phases}
+        self.frames = collections.deque(maxlen=window)
+        self.frame_start = 0.0
+        self.mark = 0.0
+        self.skipped_renders = 0
+
+    # 開始新的一幀
+    def begin_frame(self):
+        self.frame_start = self.mark = time.perf_counter()
+
+    # 記錄自上一個標記以來 phase 的耗時
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.samples[phase].append((now - self.mark) * 1000)
+        self.mark = now
+
+    # 略過某階段 (不記錄耗時)
+    def skip(self):
+        self.mark = time.perf_counter()
+        self.skipped_renders += 1
+
+    def end_frame(self):
+        self.frames.append((time.perf_counter() - self.frame_start) * 1000)
+
+    # 各階段與整幀的 p50 / p95 / p99 / max
+    def stats(self):
+        result = {}
+        for name, samples in list(self.samples.items()) + [('frame', self.frames)]:
+            values = sorted(samples)
+            result[name] = {
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99),
+                'max': values[-1] if values else 0.0,
+            }
+        return result
+
+    # 計時面板的文字行
+    def overlay_lines(self):
+        stats = self.stats()
+        frame = stats['frame']
+        return [
+            f"frame {frame['p50']:.1f}/{frame['p95']:.1f}/{frame['p99']:.1f}",
+            f"in {stats['input']['p95']:.2f} sim {stats['simulate']['p95']:.2f}",
+            f"rend {stats['render']['p95']:.2f} flip {stats['flip']['p95']:.2f}",
+            f"skipped {self.skipped_renders}",
+        ]
+
+    # 輸出一行百分位數日誌
+    def log(self):
+        stats = self.stats()
+        logger.info(' '.join(
+            f"{name}=p50:{values['p50']:.3f},p95:{values['p95']:.3f},p99:{values['p99']:.3f},max:{values['max']:.3f}"
+            for name, values in stats.items()) + f" skipped={self.skipped_renders}")
@@ -0,0 +1,126 @@
+import collections
+
+from engine import HARD_DROP, LEFT, RIGHT, ROTATE, SOFT_DROP
+
+# 輸入子系統：按鍵事件帶著到達時間 (毫秒) 進入佇列，update() 依時間順序套用到遊戲；
+# 自動重複 (DAS/ARR) 與軟降也依時間排程，一個 tick 內可移動多格，結果與幀率無關
+
+# 預設操作手感 (毫秒)：DAS_MS 為按住後開始自動重複的延遲，ARR_MS 為重複間隔 (0 為瞬間移到底)，
+# SOFT_DROP_MS 為按住下鍵時每格的間隔 (0 為瞬間落到底但不鎖定)
+DAS_MS = 200
+ARR_MS = 50
+SOFT_DROP_MS = 1000 / 60
+
+# 小於此值 (毫秒) 的 ARR 與軟降間隔視為 0 (瞬間)，避免按住時每幀排程並錄下大量重複動作
+MIN_REPEAT_MS = 1
+
+PRESS, RELEASE = 1, 0
+
+# 每位用戶的操作手感設定
+class Handling:
+    def __init__(self, das=DAS_MS, arr=ARR_MS, soft_drop=SOFT_DROP_MS):
+        if not (das >= 0 and arr >= 0 and soft_drop >= 0):
+            raise ValueError("Handling delays must not be negative")
+        self.das = das
+        self.arr = arr if arr >= MIN_REPEAT_MS else 0
+        self.soft_drop = soft_drop if soft_drop >= MIN_REPEAT_MS else 0
+
+class InputHandler:
+    def __init__(self, handling=None):
+        self.handling = handling or Handling()
+        self.events = collections.deque()
+        self.held = set()
+        self.shift = None
+        self.next_shift = None
+        self.charged = False
+        self.next_drop = None
+
+    # 記錄按下 / 放開 (action 為引擎的動作代碼，time 為事件到達的時間)
+    def press(self, action, time):
+        self.events.append((time, PRESS, action))
+
+    def release(self, action, time):
+        self.events.append((time, RELEASE, action))
+
+    # 依時間順序處理 until 以前的按鍵事件與自動重複；遊戲暫停或未開始時只更新按住的狀態
+    def update(self, game, until):
+        active = game.running and not game.paused
+        events = self.events
+        while True:
+            event_time = events[0][0] if events and events[0][0] <= until else None
+            timer = min((time for time in (self.next_shift, self.next_drop)
+                         if time is not None and time <= until), default=None)
+            if event_time is not None and (timer is None or event_time <= timer):
+                time, kind, action = events.popleft()
+                if kind == PRESS:
+                    self.pressed(game, action, time, active)
+                else:
+                    self.released(action, time)
+            elif timer is not None:
+                if timer == self.next_shift:
+                    self.repeat_shift(game, timer, active)
+                else:
+                    self.repeat_drop(game, timer, active)
+            else:
+                break
+            self.instant(game, active)
+        self.instant(game, active)
+
+    def pressed(self, game, action, time, active):
+        if action in (LEFT, RIGHT):
+            self.held.add(action)
+            self.shift = action
+            self.charged = False
+            self.next_shift = time + self.handling.das
+            if active:
+                game.apply(action)
+        elif action == SOFT_DROP:
+            self.held.add(action)
+            if self.handling.soft_drop:
+                self.next_drop = time + self.handling.soft_drop
+                if active:
+                    game.apply(SOFT_DROP)
+        elif active and action in (ROTATE, HARD_DROP):
+            game.apply(action)
+
+    # 放開目前的方向時，若另一個方向仍按著則改往該方向重新累積 DAS
+    def released(self, action, time):
+        self.held.discard(action)
+        if action == SOFT_DROP:
+            self.next_drop = None
+        elif action == self.shift:
+            other = RIGHT if action == LEFT else LEFT
+            self.charged = False
+            if other in self.held:
+                self.shift = other
+                self.next_shift = time + self.handling.das
+            else:
+                self.shift = None
+                self.next_shift = None
+
+    def repeat_shift(self, game, time, active):
+        if self.handling.arr:
+            self.next_shift = time + self.handling.arr
+            if active:
+                game.apply(self.shift)
+        else:
+            self.next_shift = None
+            self.charged = True
+
+    def repeat_drop(self, game, time, active):
+        self.next_drop = time + self.handling.soft_drop
+        if active:
+            game.apply(SOFT_DROP)
+
+    # ARR 為 0 且 DAS 已累積時移到牆邊；軟降間隔為 0 時落到底 (不鎖定)
+    def instant(self, game, active):
+        if not active:
+            return
+        brick = game.current_brick
+        if self.charged:
+            dx = -1 if self.shift == LEFT else 1
+            while game.is_valid_position(brick, dx, 0) and game.apply(self.shift):
+                pass
+        if SOFT_DROP in self.held and not self.handling.soft_drop:
+            while game.is_valid_position(brick, 0, 1) and game.apply(SOFT_DROP):
+                pass
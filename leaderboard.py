@@ -0,0 +1,80 @@
+import threading
+
+from persistence import get_database
+
+# 排行榜：全域前 N 局、個人最佳與排名，結果快取在記憶體中，
+# 只有寫入的新分數可能改變結果時才失效。查詢與存入快取在主執行緒、失效在背景寫入執行緒，
+# 兩者以 lock 互斥，避免失效發生在查詢與存入之間而留下過期結果
+TOP_SIZE = 10
+
+class Leaderboard:
+    def __init__(self, database, size=TOP_SIZE):
+        self.database = database
+        self.size = size
+        self.top_cache = None
+        self.best_cache = {}
+        self.rank_cache = {}
+        self.version = 0
+        self.lock = threading.Lock()
+        database.add_listener(self.scores_written)
+
+    # 全域分數最高的 n 局：[(username, score, lines, duration, played_at), ...]
+    def top(self, n=TOP_SIZE):
+        if n > self.size:
+            return self.database.top_games(n)
+        with self.lock:
+            top = self.top_cache
+            if top is None:
+                top = self.top_cache = self.database.top_games(self.size)
+        return top[:n]
+
+    # 用戶單局最佳分數
+    def best(self, username):
+        with self.lock:
+            best = self.best_cache.get(username)
+            if best is None:
+                best = self.best_cache[username] = self.database.user_best(username)
+        return best
+
+    # 用戶在所有玩家中的名次：與名次查詢同樣以 users.high_score 為準
+    # (舊用戶或中途離開的局可能沒有對應的 games 紀錄)
+    def rank(self, username):
+        with self.lock:
+            cached = self.rank_cache.get(username)
+            if cached is None:
+                high_score = self.database.load_high_score(username)
+                cached = self.rank_cache[username] = (high_score, self.database.rank_for_score(high_score))
+        return cached[1]
+
+    # 由背景寫入執行緒呼叫：只讓受影響的快取失效
+    def scores_written(self, scores):
+        with self.lock:
+            self.invalidate(scores)
+
+    def invalidate(self, scores):
+        changed = False
+        for username, score in scores:
+            top = self.top_cache
+            if top is not None and (len(top) < self.size or score > top[-1][1]):
+                self.top_cache = None
+                changed = True
+            if score > self.best_cache.get(username, score):
+                self.best_cache.pop(username, None)
+                changed = True
+            stale = [name for name, (high_score, rank) in list(self.rank_cache.items())
+                     if name == username or score > high_score]
+            for name in stale:
+                self.rank_cache.pop(name, None)
+                changed = True
+        if changed:
+            self.version += 1
+
+_leaderboard = None
+
+# 取得共用的排行榜 (以共用的資料庫物件為後端)
+def get_leaderboard():
+    global _leaderboard
+    database = get_database()
+    if _leaderboard is None or _leaderboard.database is not database:
+        _leaderboard = Leaderboard(database)
+    return _leaderboard
@@ -0,0 +1,202 @@
+import copy
+
+import numpy as np
+
+import engine
+
+# 落點產生器：以 NumPy 陣列一次評估某方塊所有 (旋轉, 欄) 從盤面上方直落的落點
+# 結果包含落點行、消除行數、洞數與各欄高度，可一次處理多個盤面 (用於兩層搜尋)
+
+# 每種方塊不重複的旋轉 (例如 O 只有一種)
+def unique_rotations(piece):
+    seen = set()
+    rotations = []
+    for rotation, layout in enumerate(engine.ROTATIONS[piece]):
+        if layout.shape not in seen:
+            seen.add(layout.shape)
+            rotations.append(rotation)
+    return rotations
+
+# 預先計算的落點表：每個落點的旋轉、x、4 個格子的偏移與各欄底部
+class PlacementTable:
+    def __init__(self, piece, columns):
+        rotations, xs, cell_x, cell_y, bottoms = [], [], [], [], []
+        for rotation in unique_rotations(piece):
+            layout = engine.ROTATIONS[piece][rotation]
+            bottom = [-1] * 4
+            for x, y in layout.column_bottoms:
+                bottom[x] = y
+            for x in range(columns - layout.width + 1):
+                rotations.append(rotation)
+                xs.append(x)
+                cell_x.append([x + cx for cx, cy in layout.cells])
+                cell_y.append([cy for cx, cy in layout.cells])
+                bottoms.append(bottom)
+        self.piece = piece
+        self.rotation = np.array(rotations)
+        self.x = np.array(xs)
+        self.cell_x = np.array(cell_x)
+        self.cell_y = np.array(cell_y)
+        bottoms = np.array(bottoms)
+        self.has_column = bottoms >= 0
+        self.bottom = np.where(self.has_column, bottoms, 0)
+        self.columns_index = np.minimum(self.x[:, None] + np.arange(4), columns - 1)
+
+TABLES = {}
+
+def placement_table(piece, columns):
+    key = (piece, columns)
+    table = TABLES.get(key)
+    if table is None:
+        table = TABLES[key] = PlacementTable(piece, columns)
+    return table
+
+# 盤面轉成 (rows, columns) 的布林陣列
+def board_array(board):
+    if hasattr(board, 'row_bits'):
+        width = (board.columns + 7) // 8
+        raw = b''.join(bits.to_bytes(width, 'little') for bits in board.row_bits)
+        rows = np.frombuffer(raw, dtype=np.uint8).reshape(board.rows, width)
+        return np.unpackbits(rows, axis=1, bitorder='little')[:, :board.columns].astype(bool)
+    return np.array([[cell != 0 for cell in column] for column in board.grid], dtype=bool).T
+
+# 批次落點結果，所有欄位的前兩維為 (盤面, 落點)
+class Placements:
+    def __init__(self, table, y, valid, lines, holes, heights, boards):
+        self.piece = table.piece
+        self.rotation = table.rotation
+        self.x = table.x
+        self.y = y
+        self.valid = valid
+        self.lines = lines
+        self.holes = holes
+        self.heights = heights
+        self.aggregate_height = heights.sum(axis=-1)
+        self.max_height = heights.max(axis=-1)
+        self.bumpiness = np.abs(np.diff(heights, axis=-1)).sum(axis=-1)
+        self.boards = boards
+
+# 一次評估 boards (rows, columns) 或 (B, rows, columns) 上 piece 的所有直落落點
+def enumerate_placements(boards, piece):
+    boards = np.asarray(boards, dtype=bool)
+    single = boards.ndim == 2
+    if single:
+        boards = boards[None]
+    count, rows, columns = boards.shape
+    table = placement_table(piece, columns)
+
+    # 各欄頂端 (空欄為 rows)
+    filled_any = boards.any(axis=1)
+    tops = np.where(filled_any, boards.argmax(axis=1), rows)
+
+    # 落點行：各欄 頂端 - 1 - 方塊該欄底部 的最小值
+    column_tops = tops[:, table.columns_index]
+    limits = np.where(table.has_column, column_tops - 1 - table.bottom, rows)
+    y = limits.min(axis=-1)
+    valid = y >= 0
+    y_safe = np.maximum(y, 0)
+
+    # 放上方塊後的盤面 (B, P, rows, columns)
+    placed = np.repeat(boards[:, None], len(table.x), axis=1)
+    batch_index = np.arange(count)[:, None, None]
+    placement_index = np.arange(len(table.x))[None, :, None]
+    placed[batch_index, placement_index, y_safe[:, :, None] + table.cell_y, table.cell_x] = True
+
+    # 消行：保留的行依原順序移到底部，上方補空行
+    full = placed.all(axis=-1)
+    lines = full.sum(axis=-1)
+    order = np.argsort(~full, axis=-1, kind='stable')
+    placed = np.take_along_axis(placed, order[..., None], axis=2)
+    cleared_mask = np.arange(rows) < lines[..., None]
+    placed[cleared_mask] = False
+
+    # 高度與洞數
+    seen = np.logical_or.accumulate(placed, axis=2)
+    heights = seen.sum(axis=2)
+    holes = (seen & ~placed).sum(axis=(2, 3))
+
+    lines = np.where(valid, lines, 0)
+    result = Placements(table, y, valid, lines, holes, heights, placed)
+    if single:
+        for name in ('y', 'valid', 'lines', 'holes', 'heights', 'aggregate_height',
+                     'max_height', 'bumpiness', 'boards'):
+            setattr(result, name, getattr(result, name)[0])
+    return result
+
+# 目前方塊與下一個方塊在目前盤面上的所有落點
+def game_placements(game):
+    board = board_array(game.board)
+    return (enumerate_placements(board, game.current_brick.piece),
+            enumerate_placements(board, game.next_brick.piece))
+
+# 純 Python 的對照實作：逐一以 is_valid / drop_y 與盤面複本計算，回傳 (旋轉, x, y, 消行, 洞數) 列表
+def enumerate_placements_scalar(game, piece):
+    results = []
+    for rotation in unique_rotations(piece):
+        layout = engine.ROTATIONS[piece][rotation]
+        for x in range(game.columns - layout.width + 1):
+            brick = copy.copy(game.current_brick)
+            brick.piece = piece
+            brick.rotation = rotation
+            brick.layout = layout
+            brick.x = x
+            brick.y = -layout.height
+            brick.y = game.drop_y(brick)
+            if brick.y < 0:
+                continue
+            board = copy.deepcopy(game.board)
+            board.lock(brick, brick.x, brick.y)
+            lines = len(board.clear_full_rows())
+            holes = 0
+            for column in range(game.columns):
+                covered = False
+                for row in range(game.rows):
+                    if board.get(column, row):
+                        covered = True
+                    elif covered:
+                        holes += 1
+            results.append((rotation, x, brick.y, lines, holes))
+    return results
+
+# 評分權重 (消行加分；總高度、洞與凹凸扣分)
+WEIGHTS = {'aggregate_height': -0.51, 'lines': 0.76, 'holes': -0.36, 'bumpiness': -0.18}
+
+# 選出評分最高的落點，回傳 (旋轉, x)；沒有合法落點時回傳 None
+def best_placement(game, weights=WEIGHTS):
+    placements = enumerate_placements(board_array(game.board), game.current_brick.piece)
+    score = sum(weight * getattr(placements, name).astype(float) for name, weight in weights.items())
+    score = np.where(placements.valid, score, -np.inf)
+    best = int(score.argmax())
+    if not placements.valid[best]:
+        return None
+    return int(placements.rotation[best]), int(placements.x[best])
+
+# 貪婪策略：每個新方塊選一次最佳落點，再以旋轉、左右移動與硬降抵達
+class GreedyPolicy:
+    def __init__(self, weights=WEIGHTS):
+        self.weights = weights
+        self.plan_key = None
+        self.target = None
+
+    def __call__(self, game, rng):
+        brick = game.current_brick
+        key = (id(game), game.pieces)
+        if key != self.plan_key:
+            self.plan_key = key
+            self.target = best_placement(game, self.weights)
+        if self.target is None:
+            return engine.HARD_DROP
+
+        rotation, x = self.target
+        if brick.rotation != rotation:
+            rotated = copy.copy(brick)
+            rotated.rotate()
+            if game.board.is_valid(rotated, rotated.x, rotated.y):
+                return engine.ROTATE
+        if brick.x < x and game.is_valid_position(brick, 1, 0):
+            return engine.RIGHT
+        if brick.x > x and game.is_valid_position(brick, -1, 0):
+            return engine.LEFT
+        return engine.HARD_DROP
+
+greedy_policy = GreedyPolicy()
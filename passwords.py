@@ -0,0 +1,67 @@
+import hashlib
+import hmac
+import os
+
+# 密碼雜湊：加鹽的 scrypt (無 scrypt 時改用 PBKDF2)，儲存格式為 "演算法$參數$鹽$雜湊"
+# hashlib 計算時會釋放 GIL，在背景執行緒呼叫不會拖慢遊戲畫面
+
+# scrypt 成本參數 (N 每加倍約多一倍時間與記憶體)
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# PBKDF2-SHA256 迭代次數
+PBKDF2_ITERATIONS = 200000
+
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+def scrypt_available():
+    return hasattr(hashlib, 'scrypt')
+
+def scrypt_key(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * n * r * 2, dklen=KEY_SIZE)
+
+def pbkdf2_key(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, KEY_SIZE)
+
+# 產生加鹽的雜湊字串
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, iterations=PBKDF2_ITERATIONS):
+    salt = os.urandom(SALT_SIZE)
+    if scrypt_available():
+        key = scrypt_key(password, salt, n, r, p)
+        return f"scrypt${n},{r},{p}${salt.hex()}${key.hex()}"
+    key = pbkdf2_key(password, salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${key.hex()}"
+
+# 用戶不存在時拿來驗證的固定雜湊 (鹽與雜湊全為 0，不會驗證成功)：
+# 讓不存在的帳號與存在的帳號花費相同的計算時間，無法由回應時間推測帳號是否存在
+def dummy_hash():
+    salt, key = bytes(SALT_SIZE).hex(), bytes(KEY_SIZE).hex()
+    if scrypt_available():
+        return f"scrypt${SCRYPT_N},{SCRYPT_R},{SCRYPT_P}${salt}${key}"
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${salt}${key}"
+
+# 是否為本模組產生的雜湊 (否則視為舊版的明碼)
+def is_hashed(stored):
+    return stored.startswith(('scrypt$', 'pbkdf2_sha256$'))
+
+# 驗證密碼，回傳 (是否正確, 是否需要重新雜湊)
+# 明碼或成本參數較舊的紀錄在驗證成功後需要重新雜湊
+def verify_password(password, stored):
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode()), True
+    algorithm, params, salt, key = stored.split('$')
+    salt = bytes.fromhex(salt)
+    if algorithm == 'scrypt':
+        n, r, p = (int(value) for value in params.split(','))
+        if not scrypt_available():
+            return False, False
+        computed = scrypt_key(password, salt, n, r, p)
+        outdated = (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    else:
+        iterations = int(params)
+        computed = pbkdf2_key(password, salt, iterations)
+        outdated = scrypt_available() or iterations != PBKDF2_ITERATIONS
+    return hmac.compare_digest(computed, bytes.fromhex(key)), outdated
@@ -0,0 +1,249 @@
+import sqlite3
+import threading
+
+from passwords import dummy_hash, hash_password, verify_password
+
+# 資料持久層：單一長期連線 (WAL 模式)，分數更新透過背景執行緒延後寫入
+DB_PATH = 'tetris.db'
+
+# 背景寫入的最長等待秒數 (期間內的多次更新會合併成一次)
+WRITE_BEHIND_INTERVAL = 1.0
+
+CREATE_USERS = '''CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL,
+                    high_score INTEGER DEFAULT 0)'''
+CREATE_GAMES = '''CREATE TABLE IF NOT EXISTS games (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL REFERENCES users(id),
+                    score INTEGER NOT NULL,
+                    lines INTEGER NOT NULL,
+                    duration REAL NOT NULL,
+                    played_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)'''
+CREATE_SAVES = '''CREATE TABLE IF NOT EXISTS saves (
+                    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+                    data BLOB NOT NULL,
+                    saved_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)'''
+CREATE_HANDLING = '''CREATE TABLE IF NOT EXISTS handling (
+                    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+                    das REAL NOT NULL,
+                    arr REAL NOT NULL,
+                    soft_drop REAL NOT NULL)'''
+CREATE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_games_score ON games (score DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_games_user_score ON games (user_id, score DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_users_high_score ON users (high_score DESC)',
+)
+INSERT_USER = 'INSERT INTO users (username, password) VALUES (?, ?)'
+SELECT_USER = 'SELECT * FROM users WHERE username = ?'
+UPDATE_PASSWORD = 'UPDATE users SET password = ? WHERE username = ? AND password = ?'
+SELECT_HIGH_SCORE = 'SELECT high_score FROM users WHERE username = ?'
+UPDATE_HIGH_SCORE = 'UPDATE users SET high_score = MAX(high_score, ?) WHERE username = ?'
+INSERT_GAME = '''INSERT INTO games (user_id, score, lines, duration)
+                 SELECT id, ?, ?, ? FROM users WHERE username = ?'''
+SELECT_TOP_GAMES = '''SELECT users.username, games.score, games.lines, games.duration, games.played_at
+                      FROM games JOIN users ON users.id = games.user_id
+                      ORDER BY games.score DESC LIMIT ?'''
+SELECT_USER_BEST = '''SELECT MAX(games.score) FROM games
+                      WHERE games.user_id = (SELECT id FROM users WHERE username = ?)'''
+SELECT_RANK = 'SELECT COUNT(*) + 1 FROM users WHERE high_score > ?'
+SAVE_GAME = '''INSERT OR REPLACE INTO saves (user_id, data)
+               SELECT id, ? FROM users WHERE username = ?'''
+SELECT_SAVE = '''SELECT data FROM saves
+                 WHERE user_id = (SELECT id FROM users WHERE username = ?)'''
+DELETE_SAVE = 'DELETE FROM saves WHERE user_id = (SELECT id FROM users WHERE username = ?)'
+SAVE_HANDLING = '''INSERT OR REPLACE INTO handling (user_id, das, arr, soft_drop)
+                   SELECT id, ?, ?, ? FROM users WHERE username = ?'''
+SELECT_HANDLING = '''SELECT das, arr, soft_drop FROM handling
+                     WHERE user_id = (SELECT id FROM users WHERE username = ?)'''
+
+class Database:
+    def __init__(self, path=DB_PATH, interval=WRITE_BEHIND_INTERVAL):
+        # sqlite3 依 SQL 文字快取已編譯的語句，固定的 SQL 常數即等同預備語句
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.lock = threading.Lock()
+        self.interval = interval
+        self.pending = {}
+        self.pending_games = []
+        self.listeners = []
+        self.condition = threading.Condition()
+        self.requested = 0
+        self.written = 0
+        self.closed = False
+        self.writer = threading.Thread(target=self.write_behind, name='score-writer', daemon=True)
+        self.writer.start()
+
+    # 建立資料表與索引
+    def init_schema(self):
+        with self.lock:
+            self.conn.execute(CREATE_USERS)
+            self.conn.execute(CREATE_GAMES)
+            self.conn.execute(CREATE_SAVES)
+            self.conn.execute(CREATE_HANDLING)
+            for statement in CREATE_INDEXES:
+                self.conn.execute(statement)
+            self.conn.commit()
+
+    # 註冊寫入完成的通知 listener(scores)，scores 為 [(username, score), ...]
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    # 註冊新用戶 (密碼雜湊較慢，在鎖外計算；應從背景執行緒呼叫)
+    def register_user(self, username, password):
+        hashed = hash_password(password)
+        with self.lock:
+            try:
+                self.conn.execute(INSERT_USER, (username, hashed))
+                self.conn.commit()
+            except sqlite3.IntegrityError:
+                return False
+        return True
+
+    # 用戶登入，成功時回傳用戶資料列；明碼或舊參數的密碼在登入成功後改存新的雜湊
+    # (用戶不存在時仍驗證一次固定雜湊，使回應時間與帳號是否存在無關)
+    def login_user(self, username, password):
+        with self.lock:
+            user = self.conn.execute(SELECT_USER, (username,)).fetchone()
+        if user is None:
+            verify_password(password, dummy_hash())
+            return None
+        stored = user[2]
+        valid, needs_rehash = verify_password(password, stored)
+        if not valid:
+            return None
+        if needs_rehash:
+            hashed = hash_password(password)
+            with self.lock:
+                self.conn.execute(UPDATE_PASSWORD, (hashed, username, stored))
+                self.conn.commit()
+        return user
+
+    # 讀取高分 (尚未寫入的分數優先)
+    def load_high_score(self, username):
+        with self.condition:
+            pending = self.pending.get(username)
+        with self.lock:
+            row = self.conn.execute(SELECT_HIGH_SCORE, (username,)).fetchone()
+        high_score = row[0] if row else 0
+        if pending is not None and pending > high_score:
+            return pending
+        return high_score
+
+    # 將高分放入寫入佇列，同一用戶只保留最高的一筆
+    def queue_high_score(self, username, score):
+        with self.condition:
+            if score > self.pending.get(username, -1):
+                self.pending[username] = score
+
+    # 將一局結束的紀錄放入寫入佇列
+    def queue_game(self, username, score, lines, duration):
+        with self.condition:
+            self.pending_games.append((score, lines, duration, username))
+
+    # 分數最高的 n 局
+    def top_games(self, n):
+        with self.lock:
+            return self.conn.execute(SELECT_TOP_GAMES, (n,)).fetchall()
+
+    # 用戶單局最佳分數
+    def user_best(self, username):
+        with self.lock:
+            row = self.conn.execute(SELECT_USER_BEST, (username,)).fetchone()
+        return row[0] or 0
+
+    # 以最高分計算的玩家排名
+    def rank_for_score(self, score):
+        with self.lock:
+            return self.conn.execute(SELECT_RANK, (score,)).fetchone()[0]
+
+    # 保存進行中的遊戲快照 (每個用戶一份)
+    def save_game(self, username, data):
+        with self.lock:
+            self.conn.execute(SAVE_GAME, (data, username))
+            self.conn.commit()
+
+    # 讀取用戶保存的遊戲快照，沒有時回傳 None
+    def load_game(self, username):
+        with self.lock:
+            row = self.conn.execute(SELECT_SAVE, (username,)).fetchone()
+        return row[0] if row else None
+
+    def delete_game(self, username):
+        with self.lock:
+            self.conn.execute(DELETE_SAVE, (username,))
+            self.conn.commit()
+
+    # 保存用戶的操作手感設定 (DAS、ARR 與軟降間隔，單位為毫秒)
+    def save_handling(self, username, das, arr, soft_drop):
+        with self.lock:
+            self.conn.execute(SAVE_HANDLING, (das, arr, soft_drop, username))
+            self.conn.commit()
+
+    # 讀取用戶的操作手感設定，沒有設定過時回傳 None
+    def load_handling(self, username):
+        with self.lock:
+            return self.conn.execute(SELECT_HANDLING, (username,)).fetchone()
+
+    # 要求背景執行緒立即寫入；wait 為 True 時等待寫入完成
+    def flush(self, wait=True):
+        with self.condition:
+            self.requested += 1
+            target = self.requested
+            self.condition.notify_all()
+            if wait:
+                self.condition.wait_for(lambda: self.written >= target or not self.writer.is_alive())
+
+    # 背景寫入執行緒
+    def write_behind(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.requested > self.written or self.closed,
+                                        timeout=self.interval)
+                batch = self.pending
+                self.pending = {}
+                games = self.pending_games
+                self.pending_games = []
+                target = self.requested
+                closed = self.closed
+            if batch or games:
+                with self.lock:
+                    self.conn.executemany(UPDATE_HIGH_SCORE,
+                                          [(score, username) for username, score in batch.items()])
+                    self.conn.executemany(INSERT_GAME, games)
+                    self.conn.commit()
+                scores = list(batch.items()) + [(username, score) for score, lines, duration, username in games]
+                for listener in self.listeners:
+                    listener(scores)
+            with self.condition:
+                self.written = max(self.written, target)
+                self.condition.notify_all()
+            if closed:
+                return
+
+    # 寫入所有待處理的分數並關閉連線
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.writer.join()
+        with self.lock:
+            self.conn.close()
+
+_database = None
+
+# 取得共用的資料庫物件 (第一次使用時才連線)
+def get_database(path=DB_PATH):
+    global _database
+    if _database is None:
+        _database = Database(path)
+    return _database
+
+# 關閉共用的資料庫物件
+def close_database():
+    global _database
+    if _database is not None:
+        _database.close()
+        _database = None
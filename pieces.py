@@ -0,0 +1,76 @@
+# 方塊產生器：以遊戲的種子化 rng 產生方塊編號序列，產生時不配置新物件
+
+# 純隨機：每次獨立抽一種
+class RandomGenerator:
+    def __init__(self, rng, count):
+        self.rng = rng
+        self.count = count
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.rng.randrange(self.count)
+
+# 7-bag：每輪把所有方塊各放一個進袋子洗牌後依序發出，袋子重複使用
+class BagGenerator:
+    def __init__(self, rng, count):
+        self.rng = rng
+        self.bag = list(range(count))
+        self.index = count
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.index == len(self.bag):
+            self.rng.shuffle(self.bag)
+            self.index = 0
+        piece = self.bag[self.index]
+        self.index += 1
+        return piece
+
+# 仿 NES：多抽一個空號，抽到空號或與上一個相同時重抽一次 (重抽結果直接採用)
+class NESGenerator:
+    def __init__(self, rng, count):
+        self.rng = rng
+        self.count = count
+        self.last = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        piece = self.rng.randrange(self.count + 1)
+        if piece == self.count or piece == self.last:
+            piece = self.rng.randrange(self.count)
+        self.last = piece
+        return piece
+
+GENERATORS = {
+    'random': RandomGenerator,
+    'bag': BagGenerator,
+    'nes': NESGenerator,
+}
+
+# 預覽佇列：固定大小的環狀緩衝區，取出一個就立刻補上一個
+class PreviewQueue:
+    def __init__(self, generator, size):
+        if size < 1:
+            raise ValueError("Preview queue needs at least one piece")
+        self.generator = generator
+        self.items = [next(generator) for _ in range(size)]
+        self.head = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    # 第 index 個即將出現的方塊 (0 為下一個)
+    def peek(self, index=0):
+        return self.items[(self.head + index) % len(self.items)]
+
+    def pop(self):
+        piece = self.items[self.head]
+        self.items[self.head] = next(self.generator)
+        self.head = (self.head + 1) % len(self.items)
+        return piece
@@ -0,0 +1,138 @@
+import atexit
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import time
+
+# 可選的效能量測：enable() 時才替熱點方法包上計時器 (未啟用時沒有任何額外成本)，
+# 另有遊戲中開關 cProfile 的 ProfileToggle
+logger = logging.getLogger('tetris.profile')
+
+# 設定 TETRIS_PROFILE=路徑 時，啟動時安裝計時器並在結束時把結果寫成 JSON
+PROFILE_PATH = os.environ.get('TETRIS_PROFILE')
+
+# cProfile 結果的保存位置與日誌中列出的函式數
+PROFILE_DIR = 'profiles'
+PROFILE_TOP = 15
+
+# 資料庫中要量測的方法
+DATABASE_METHODS = ('register_user', 'login_user', 'load_high_score', 'queue_high_score', 'queue_game',
+                    'top_games', 'user_best', 'rank_for_score', 'save_game', 'load_game',
+                    'delete_game', 'save_handling', 'load_handling', 'flush')
+
+# 單一函式的呼叫次數、總耗時與最長單次耗時 (秒)
+class Timer:
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+TIMERS = {}
+INSTALLED = []
+
+def timed(name, function):
+    timer = TIMERS.setdefault(name, Timer())
+    perf_counter = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            timer.count += 1
+            timer.total += elapsed
+            if elapsed > timer.max:
+                timer.max = elapsed
+    return wrapper
+
+# 替 owner 上定義的方法包上計時器 (重複安裝時略過)
+def instrument(owner, name):
+    if any(installed_owner is owner and installed_name == name for installed_owner, installed_name, _ in INSTALLED):
+        return
+    function = owner.__dict__[name]
+    setattr(owner, name, timed(f"{owner.__name__}.{name}", function))
+    INSTALLED.append((owner, name, function))
+
+# 預設量測的熱點：碰撞檢查、鎖定、消行、落點計算與資料庫呼叫
+def default_targets():
+    import engine
+    import persistence
+    targets = [(engine.Game, name) for name in
+               ('is_valid_position', 'lock_brick', 'clear_lines', 'get_drop_position')]
+    targets += [(persistence.Database, name) for name in DATABASE_METHODS]
+    return targets
+
+# 安裝計時器 (extra 為額外的 (類別, 方法名稱))；傳入 path 時在行程結束時寫出報告
+def enable(extra=(), path=None):
+    for owner, name in default_targets() + list(extra):
+        instrument(owner, name)
+    if path:
+        atexit.register(write_report, path)
+
+# 移除所有計時器，恢復原本的方法
+def disable():
+    while INSTALLED:
+        owner, name, function = INSTALLED.pop()
+        setattr(owner, name, function)
+
+def reset():
+    for timer in TIMERS.values():
+        timer.count = 0
+        timer.total = 0.0
+        timer.max = 0.0
+
+# 目前的量測結果 (只包含被呼叫過的函式)
+def report():
+    return {
+        name: {
+            'count': timer.count,
+            'total_ms': timer.total * 1000,
+            'mean_us': timer.total / timer.count * 1e6,
+            'max_ms': timer.max * 1000,
+        }
+        for name, timer in sorted(TIMERS.items()) if timer.count
+    }
+
+def write_report(path):
+    with open(path, 'w') as f:
+        json.dump(report(), f, indent=2)
+
+# 遊戲中切換 cProfile：第一次呼叫開始記錄，第二次停止並保存到 PROFILE_DIR，回傳檔案路徑
+class ProfileToggle:
+    def __init__(self, directory=PROFILE_DIR):
+        self.directory = directory
+        self.profile = None
+
+    @property
+    def active(self):
+        return self.profile is not None
+
+    def toggle(self):
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            logger.info('cProfile started')
+            return None
+        return self.stop()
+
+    def stop(self):
+        profile = self.profile
+        if profile is None:
+            return None
+        profile.disable()
+        self.profile = None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, time.strftime('tetris-%Y%m%d-%H%M%S.prof'))
+        profile.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        logger.info('cProfile saved to %s\n%s', path, summary.getvalue())
+        return path
@@ -0,0 +1,166 @@
+import argparse
+import struct
+
+import engine
+from pieces import GENERATORS
+
+# 錄影格式：檔頭 (種子、盤面設定、方塊產生器、結果與結束時的狀態雜湊)
+# + 以 varint 差值編碼的 (tick, 動作) 序列
+MAGIC = b'TRPL'
+VERSION = 3
+HEADER = struct.Struct('<4sBQHHHBIIIIQH')
+ACTION_BITS = 3
+
+# 方塊產生器在檔頭中的編號
+RANDOMIZERS = tuple(GENERATORS)
+
+# 將 (tick, 動作) 序列以 varint 差值編碼附加到 out
+def encode_events(events, out):
+    last_tick = 0
+    for tick, action in events:
+        value = (tick - last_tick) << ACTION_BITS | action
+        last_tick = tick
+        while value >= 0x80:
+            out.append(value & 0x7F | 0x80)
+            value >>= 7
+        out.append(value)
+    return out
+
+# 解碼 encode_events 的輸出
+def decode_events(data):
+    events = []
+    tick = 0
+    value = shift = 0
+    for byte in memoryview(data):
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        tick += value >> ACTION_BITS
+        events.append((tick, value & ((1 << ACTION_BITS) - 1)))
+        value = shift = 0
+    return events
+
+# 錄下遊戲中套用的每個動作
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def record(self, tick, action):
+        self.events.append((tick, action))
+
+class Replay:
+    def __init__(self, seed, columns=engine.COLUMNS, rows=engine.ROWS,
+                 gravity_ticks=engine.GRAVITY_TICKS, events=(), end_tick=0,
+                 score=0, lines=0, pieces=0, player_name='', randomizer=engine.RANDOMIZER,
+                 state_hash=0):
+        self.seed = seed
+        self.columns = columns
+        self.rows = rows
+        self.gravity_ticks = gravity_ticks
+        self.randomizer = randomizer
+        self.state_hash = state_hash
+        self.events = list(events)
+        self.end_tick = end_tick
+        self.score = score
+        self.lines = lines
+        self.pieces = pieces
+        self.player_name = player_name
+
+    # 由一局已錄影的遊戲建立錄影
+    @classmethod
+    def from_game(cls, game, player_name=''):
+        return cls(game.seed, game.columns, game.rows, game.gravity_ticks,
+                   game.recorder.events, game.tick, game.score, game.lines,
+                   game.pieces, player_name, game.randomizer, game.state_hash())
+
+    # 建立與錄影相同設定的新遊戲
+    def new_game(self, board='bitboard'):
+        return engine.Game(self.seed, self.columns, self.rows, self.gravity_ticks, board=board,
+                           randomizer=self.randomizer)
+
+    def to_bytes(self):
+        if not 0 <= self.seed < 1 << 64:
+            raise ValueError("Replay seed must be a non-negative 64-bit integer")
+        name = self.player_name.encode('utf-8')
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.seed,
+                                    self.columns, self.rows, self.gravity_ticks,
+                                    RANDOMIZERS.index(self.randomizer), self.end_tick,
+                                    self.score, self.lines, self.pieces, self.state_hash,
+                                    len(name)))
+        out += name
+        return bytes(encode_events(self.events, out))
+
+    @classmethod
+    def from_bytes(cls, data):
+        if bytes(data[:4]) != MAGIC:
+            raise ValueError("Not a Tetris replay")
+        if data[4] != VERSION:
+            raise ValueError(f"Unsupported replay version {data[4]}")
+        (magic, version, seed, columns, rows, gravity_ticks, randomizer,
+         end_tick, score, lines, pieces, state_hash, name_length) = HEADER.unpack_from(data)
+        offset = HEADER.size
+        player_name = bytes(data[offset:offset + name_length]).decode('utf-8')
+        offset += name_length
+        events = decode_events(memoryview(data)[offset:])
+        return cls(seed, columns, rows, gravity_ticks, events, end_tick,
+                   score, lines, pieces, player_name, RANDOMIZERS[randomizer], state_hash)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+# 逐 tick 重播：先套用該 tick 的動作再推進；回傳的產生器每個 tick 產出一次遊戲狀態
+def iter_replay(replay, game=None):
+    if game is None:
+        game = replay.new_game()
+    game.running = True
+    events = replay.events
+    index = 0
+    while True:
+        while index < len(events) and events[index][0] == game.tick:
+            game.apply(events[index][1])
+            index += 1
+        if not game.running or game.tick >= replay.end_tick:
+            break
+        game.step()
+        yield game
+    yield game
+
+# 以最高速無頭重播，回傳結束時的遊戲
+def run_replay(replay, board='bitboard'):
+    game = replay.new_game(board)
+    for game in iter_replay(replay, game):
+        pass
+    return game
+
+# 重播並比對錄影中記錄的結果與最終狀態雜湊 (用於驗證高分)
+def verify(replay):
+    game = run_replay(replay)
+    return ((game.score, game.lines, game.pieces, game.state_hash()) ==
+            (replay.score, replay.lines, replay.pieces, replay.state_hash))
+
+def main():
+    parser = argparse.ArgumentParser(description="Tetris replays")
+    parser.add_argument('command', choices=['verify', 'play'])
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=int, default=1)
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    if args.command == 'verify':
+        ok = verify(replay)
+        print(f"{args.path}: {replay.player_name} score {replay.score}, lines {replay.lines}, "
+              f"pieces {replay.pieces} -> {'OK' if ok else 'MISMATCH'}")
+        raise SystemExit(0 if ok else 1)
+    else:
+        import Tetris
+        Tetris.replay_loop(replay, args.speed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import array
+import struct
+
+import engine
+from board import BOARDS
+from pieces import GENERATORS, PreviewQueue
+from replay import decode_events, encode_events
+
+# 遊戲狀態快照：固定長度的檔頭 + 色盤、每行遮罩、顏色平面、預覽佇列、7-bag、亂數狀態與已錄動作
+# 各區段都以 struct / array / memoryview 整段打包與切片，不為每個格子建立 Python 物件
+MAGIC = b'TSNP'
+VERSION = 1
+HEADER = struct.Struct('<4sBQHHHBBBQIIIIIBBBhhBBbBIH')
+
+BOARD_KINDS = tuple(BOARDS)
+RANDOMIZERS = tuple(GENERATORS)
+
+# 遊戲狀態旗標
+RUNNING, GAME_OVER, PAUSED = 1, 2, 4
+
+def board_kind(board):
+    for index, board_class in enumerate(BOARDS.values()):
+        if type(board) is board_class:
+            return index
+    raise ValueError(f"Unknown board type {type(board).__name__}")
+
+# 盤面的色盤與顏色平面 (每格一個色盤索引)；BitBoard 直接沿用自身的資料，GridBoard 逐格轉換
+def board_colors(board):
+    if hasattr(board, 'colors'):
+        return board.palette, board.colors
+    palette = [0]
+    palette_index = {}
+    colors = bytearray(board.columns * board.rows)
+    for x, column in enumerate(board.grid):
+        for y, cell in enumerate(column):
+            if cell:
+                index = palette_index.get(cell)
+                if index is None:
+                    index = palette_index[cell] = len(palette)
+                    palette.append(cell)
+                colors[y * board.columns + x] = index
+    return palette, colors
+
+# 將遊戲狀態打包成 bytes；events 為 False 時不包含錄影動作
+def snapshot(game, events=True):
+    board = game.board
+    brick = game.current_brick
+    queue = game.queue
+    generator = queue.generator
+    last = getattr(generator, 'last', None)
+    palette, colors = board_colors(board)
+    width = (game.columns + 7) // 8
+    rng_state = game.rng.getstate()[1]
+    recorded = b''
+    if events and game.recorder is not None:
+        recorded = encode_events(game.recorder.events, bytearray())
+    flags = ((RUNNING if game.running else 0) | (GAME_OVER if game.game_over else 0) |
+             (PAUSED if game.paused else 0))
+
+    header = HEADER.pack(MAGIC, VERSION, game.seed, game.columns, game.rows, game.gravity_ticks,
+                         board_kind(board), RANDOMIZERS.index(game.randomizer), len(queue),
+                         game.score, game.lines, game.pieces, game.board_version, game.tick,
+                         game.drop_timer, flags, brick.piece, brick.rotation, brick.x, brick.y,
+                         queue.head, getattr(generator, 'index', 0), -1 if last is None else last,
+                         len(palette) - 1, len(recorded), len(rng_state))
+    return b''.join((
+        header,
+        bytes(channel for color in palette[1:] for channel in color),
+        b''.join(bits.to_bytes(width, 'little') for bits in board.row_occupancy()),
+        colors,
+        bytes(queue.items),
+        bytes(getattr(generator, 'bag', ())),
+        array.array('I', rng_state).tobytes(),
+        recorded,
+    ))
+
+# 由快照還原遊戲；傳入 game 時覆寫該物件 (例如保留 Tetris 子類別的玩家資料)，否則建立新的 engine.Game
+def restore(data, game=None):
+    view = memoryview(data)
+    if bytes(view[:4]) != MAGIC:
+        raise ValueError("Not a Tetris snapshot")
+    if view[4] != VERSION:
+        raise ValueError(f"Unsupported snapshot version {view[4]}")
+    (magic, version, seed, columns, rows, gravity_ticks, kind, randomizer, preview,
+     score, lines, pieces, board_version, tick, drop_timer, flags, piece, rotation, x, y,
+     head, bag_index, last, palette_size, events_size, rng_size) = HEADER.unpack_from(view)
+
+    if game is None:
+        game = engine.Game(seed, columns, rows, gravity_ticks, BOARD_KINDS[kind],
+                           RANDOMIZERS[randomizer], preview)
+    else:
+        game.seed = seed
+        game.columns = columns
+        game.rows = rows
+        game.gravity_ticks = gravity_ticks
+        game.board = BOARDS[BOARD_KINDS[kind]](columns, rows)
+        game.randomizer = RANDOMIZERS[randomizer]
+        game.queue = PreviewQueue(GENERATORS[game.randomizer](game.rng, len(engine.SHAPES)), preview)
+    board = game.board
+    queue = game.queue
+    generator = queue.generator
+
+    offset = HEADER.size
+    palette = [0]
+    for start in range(offset, offset + palette_size * 3, 3):
+        palette.append(tuple(view[start:start + 3]))
+    offset += palette_size * 3
+
+    width = (columns + 7) // 8
+    row_bits = [int.from_bytes(view[start:start + width], 'little')
+                for start in range(offset, offset + rows * width, width)]
+    offset += rows * width
+    colors = view[offset:offset + columns * rows]
+    offset += columns * rows
+    if hasattr(board, 'colors'):
+        board.row_bits = row_bits
+        board.colors[:] = colors
+        board.palette = palette
+        board.palette_index = {color: index for index, color in enumerate(palette) if index}
+    else:
+        for column_x, column in enumerate(board.grid):
+            for row in range(rows):
+                column[row] = palette[colors[row * columns + column_x]]
+    board.recompute_heights()
+
+    queue.items[:] = view[offset:offset + preview]
+    queue.head = head
+    offset += preview
+    if hasattr(generator, 'bag'):
+        generator.bag[:] = view[offset:offset + len(generator.bag)]
+        generator.index = bag_index
+        offset += len(generator.bag)
+    if hasattr(generator, 'last'):
+        generator.last = None if last < 0 else last
+
+    rng_state = array.array('I')
+    rng_state.frombytes(view[offset:offset + rng_size * 4])
+    game.rng.setstate((3, tuple(rng_state), None))
+    offset += rng_size * 4
+
+    if game.recorder is not None:
+        game.recorder.events = decode_events(view[offset:offset + events_size])
+
+    brick = engine.Brick(piece, columns)
+    brick.rotate(rotation)
+    brick.x = x
+    brick.y = y
+    game.current_brick = brick
+    game.next_brick = game.new_brick()
+    game.score = score
+    game.lines = lines
+    game.pieces = pieces
+    game.board_version = board_version
+    game.tick = tick
+    game.drop_timer = drop_timer
+    game.running = bool(flags & RUNNING)
+    game.game_over = bool(flags & GAME_OVER)
+    game.paused = bool(flags & PAUSED)
+    game.cleared_rows = []
+    game.garbage = []
+    game.attack = 0
+    game.topped_out = False
+    game.drop_key = None
+    game.drop_brick = None
+    return game
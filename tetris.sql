@@ -3,4 +3,30 @@ CREATE TABLE IF NOT EXISTS users (
     username TEXT UNIQUE NOT NULL,
     password TEXT NOT NULL,
     high_score INTEGER DEFAULT 0
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    score INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    played_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS saves (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    data BLOB NOT NULL,
+    saved_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS handling (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    das REAL NOT NULL,
+    arr REAL NOT NULL,
+    soft_drop REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_games_score ON games (score DESC);
+CREATE INDEX IF NOT EXISTS idx_games_user_score ON games (user_id, score DESC);
+CREATE INDEX IF NOT EXISTS idx_users_high_score ON users (high_score DESC);
\ No newline at end of file
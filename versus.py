@@ -0,0 +1,587 @@
+import argparse
+import asyncio
+import random
+import statistics
+import struct
+import time
+
+import engine
+from batch import load_policy
+from frametime import percentile
+
+# 對戰模式：多個遊戲實例互相傳送垃圾行。同一行程內以 Match 直接推進；
+# 跨行程時經由 asyncio 的 TCP / Unix socket，只傳送帶 tick 戳記的輸入與垃圾行事件 (不傳整個盤面)，
+# 各玩家以相同的種子重播對手的事件，得到對手的盤面
+MIN_PLAYERS, MAX_PLAYERS = 2, 8
+
+# 對手盤面沒有輸入時，每隔幾個 tick 送一次 SYNC 讓鏡像跟上重力
+SYNC_TICKS = 6
+
+# 每次從 socket 讀取的大小，以及單一連線允許累積的未送出資料上限 (超過即斷線)
+READ_SIZE = 65536
+MAX_BUFFERED = 1 << 20
+
+# 每個訊息以 1 位元組的類型開頭，其後為固定長度的欄位 (只有 JOIN 後接名稱)
+JOIN, START, INPUT, SYNC, ATTACK, GARBAGE, RECEIVED, TOPOUT, END = range(1, 10)
+MESSAGES = {
+    JOIN: struct.Struct('<BB'),         # 名稱長度，後接 UTF-8 名稱
+    START: struct.Struct('<BBBQHHH'),   # 玩家編號、人數、種子、欄數、行數、重力 tick
+    INPUT: struct.Struct('<BBIB'),      # 玩家、tick、動作
+    SYNC: struct.Struct('<BBI'),        # 玩家、tick
+    ATTACK: struct.Struct('<BBIB'),     # 玩家、tick、攻擊行數
+    GARBAGE: struct.Struct('<BBBBB'),   # 目標、攻擊者、行數、缺口欄 (只送給目標)
+    RECEIVED: struct.Struct('<BBIBB'),  # 玩家、tick、行數、缺口欄 (目標收下垃圾行的時間點)
+    TOPOUT: struct.Struct('<BBIQ'),     # 玩家、tick、結束時的狀態雜湊
+    END: struct.Struct('<BB'),          # 勝利者
+}
+NO_WINNER = 255
+
+# 單一 tick 最多只能送出的攻擊行數 (一次鎖定最多消 4 行)
+MAX_GARBAGE_LINES = max(engine.ATTACK_TABLE)
+
+def encode(kind, *fields):
+    return MESSAGES[kind].pack(kind, *fields)
+
+def encode_join(name):
+    name = name.encode('utf-8')[:255]
+    return encode(JOIN, len(name)) + name
+
+# 從 buffer 切出所有完整的訊息，回傳 (訊息欄位列表, 用掉的位元組數)；不完整的尾端留待下次
+def parse_messages(buffer):
+    messages = []
+    offset = 0
+    with memoryview(buffer) as view:
+        while offset < len(view):
+            kind = view[offset]
+            message = MESSAGES.get(kind)
+            if message is None:
+                raise ValueError(f"Unknown message type {kind}")
+            end = offset + message.size
+            if end > len(view):
+                break
+            fields = message.unpack_from(view, offset)
+            if kind == JOIN:
+                end += fields[1]
+                if end > len(view):
+                    break
+                fields = (JOIN, bytes(view[offset + message.size:end]).decode('utf-8'))
+            messages.append(fields)
+            offset = end
+    return messages, offset
+
+# 網路送來的垃圾行是否合理：行數在單次攻擊上限內、缺口在盤面內；不合理的訊息直接丟棄
+def valid_garbage(lines, hole, columns):
+    return 0 < lines <= MAX_GARBAGE_LINES and 0 <= hole < columns
+
+# 以 "主機:埠" 或 "unix:路徑" 指定位址
+def split_address(address):
+    if address.startswith('unix:'):
+        return None, address[5:]
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+async def open_connection(address):
+    host, port = split_address(address)
+    if host is None:
+        return await asyncio.open_unix_connection(port)
+    return await asyncio.open_connection(host, port)
+
+# 垃圾行分配：每位玩家輪流攻擊仍存活的對手，缺口欄由對戰種子的 rng 決定
+class GarbageRouter:
+    def __init__(self, players, columns, seed):
+        self.rng = random.Random(seed)
+        self.columns = columns
+        self.alive = list(range(players))
+        self.turns = [0] * players
+
+    def eliminate(self, player):
+        if player in self.alive:
+            self.alive.remove(player)
+
+    # 回傳 (目標玩家, 缺口欄)，沒有存活的對手時回傳 None
+    def route(self, source):
+        opponents = [player for player in self.alive if player != source]
+        if not opponents:
+            return None
+        target = opponents[self.turns[source] % len(opponents)]
+        self.turns[source] += 1
+        return target, self.rng.randrange(self.columns)
+
+# 同一行程內的對戰：所有玩家使用相同的種子 (相同的方塊順序)，每個 tick 推進所有人並轉送攻擊
+class Match:
+    def __init__(self, players, seed=None, columns=engine.COLUMNS, rows=engine.ROWS, **kwargs):
+        if not MIN_PLAYERS <= players <= MAX_PLAYERS:
+            raise ValueError(f"A match needs {MIN_PLAYERS} to {MAX_PLAYERS} players")
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.games = [engine.Game(seed, columns, rows, **kwargs) for _ in range(players)]
+        self.router = GarbageRouter(players, columns, seed)
+        self.sent = [0] * players
+        self.winner = None
+        for game in self.games:
+            game.running = True
+
+    @property
+    def finished(self):
+        return len(self.router.alive) <= 1
+
+    # 推進一個 tick，actions[i] 為第 i 位玩家的動作；回傳對戰是否結束
+    def step(self, actions):
+        for game, action in zip(self.games, actions):
+            game.step(action)
+        self.route()
+        return self.finished
+
+    # 轉送本 tick 產生的攻擊，並淘汰遊戲結束的玩家
+    def route(self):
+        for source, game in enumerate(self.games):
+            lines = game.take_attack()
+            routed = self.router.route(source) if lines else None
+            if routed is not None:
+                target, hole = routed
+                self.games[target].receive_garbage(lines, hole)
+                self.sent[source] += lines
+        for player, game in enumerate(self.games):
+            if game.game_over:
+                self.router.eliminate(player)
+        if self.finished and self.winner is None:
+            self.winner = self.router.alive[0] if self.router.alive else NO_WINNER
+            for game in self.games:
+                game.running = False
+
+# 以各自的策略 policy(game, rng) -> 動作 跑一場同行程對戰
+def play_match(policies, seed=None, max_ticks=100000, **kwargs):
+    match = Match(len(policies), seed, **kwargs)
+    rngs = [random.Random(match.seed + i) for i in range(len(policies))]
+    while not match.finished and match.games[0].tick < max_ticks:
+        match.step([policy(game, rng) for policy, game, rng in zip(policies, match.games, rngs)])
+    return match
+
+# 以鍵盤與 players - 1 個機器人 (policy) 在同一行程對戰：玩家為 0 號，以即時 60 tick/s 推進；
+# 對戰結束後畫面停在結果，直到關閉視窗
+def play_keyboard_match(players=2, policy='engine:random_policy', seed=None, handling=None, **kwargs):
+    import Tetris
+    keyboard = Tetris.KeyboardPlayer(handling=handling)
+    match = Match(players, seed, **kwargs)
+    policies = [keyboard.policy] + [load_policy(policy)] * (players - 1)
+    rngs = [random.Random(match.seed + i) for i in range(players)]
+    opponents = [(f"bot{i}", game) for i, game in enumerate(match.games) if i]
+    tick_seconds = 1 / engine.TICKS_PER_SECOND
+    next_tick = time.perf_counter()
+    while keyboard.frame(match.games[0], opponents):
+        if not match.finished:
+            match.step([policy(game, rng) for policy, game, rng in zip(policies, match.games, rngs)])
+        next_tick = max(next_tick + tick_seconds, time.perf_counter() - 8 * tick_seconds)
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    return match
+
+# 對手盤面的鏡像：以相同的種子依序重播對手送來的事件
+class Mirror:
+    def __init__(self, seed, columns, rows, gravity_ticks):
+        self.game = engine.Game(seed, columns, rows, gravity_ticks)
+        self.game.running = True
+        self.final_hash = None
+
+    # 推進到對手的 tick (對手在這段時間沒有輸入)
+    def advance(self, tick):
+        game = self.game
+        while game.running and game.tick < tick:
+            game.step()
+
+    def input(self, tick, action):
+        self.advance(tick)
+        self.game.apply(action)
+
+    def garbage(self, tick, lines, hole):
+        self.advance(tick)
+        self.game.receive_garbage(lines, hole)
+
+    def top_out(self, tick, state_hash):
+        self.advance(tick)
+        self.final_hash = state_hash
+
+    # 對手結束時回報的狀態雜湊與鏡像一致 (尚未結束時視為一致)
+    @property
+    def in_sync(self):
+        return self.final_hash is None or self.final_hash == self.game.state_hash()
+
+# 對戰伺服器：收齊玩家後廣播 START，之後只轉送訊息、分配垃圾行與判定勝負，不模擬盤面
+class VersusServer:
+    def __init__(self, players, seed=None, columns=engine.COLUMNS, rows=engine.ROWS,
+                 gravity_ticks=engine.GRAVITY_TICKS):
+        if not MIN_PLAYERS <= players <= MAX_PLAYERS:
+            raise ValueError(f"A match needs {MIN_PLAYERS} to {MAX_PLAYERS} players")
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.players = players
+        self.seed = seed
+        self.columns = columns
+        self.rows = rows
+        self.gravity_ticks = gravity_ticks
+        self.router = GarbageRouter(players, columns, seed)
+        self.writers = {}
+        self.names = {}
+        self.handlers = set()
+        self.winner = None
+        self.finished = None
+        self.server = None
+        self.address = None
+
+    # 開始監聽，回傳實際的位址 (埠為 0 時由系統分配)
+    async def start(self, address='127.0.0.1:0'):
+        self.finished = asyncio.Event()
+        host, port = split_address(address)
+        if host is None:
+            self.server = await asyncio.start_unix_server(self.handle, port)
+            self.address = address
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+            self.address = f"{host}:{self.server.sockets[0].getsockname()[1]}"
+        return self.address
+
+    # 等到對戰結束
+    async def wait(self):
+        await self.finished.wait()
+
+    # 關閉監聽與所有連線，並等待各連線的處理工作結束
+    async def close(self):
+        self.server.close()
+        for writer in self.writers.values():
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        player = None
+        buffer = bytearray()
+        handler = asyncio.current_task()
+        self.handlers.add(handler)
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                messages, used = parse_messages(buffer)
+                del buffer[:used]
+                for fields in messages:
+                    if fields[0] == JOIN:
+                        player = self.join(fields[1], writer)
+                        if player is None:
+                            return
+                    elif player is not None and fields[1] == player:
+                        self.dispatch(player, fields)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if player is not None:
+                self.eliminate(player)
+            writer.close()
+            self.handlers.discard(handler)
+
+    # 登記玩家，人數到齊時通知所有人開始；已滿時拒絕
+    def join(self, name, writer):
+        if len(self.writers) >= self.players:
+            return None
+        player = len(self.writers)
+        self.writers[player] = writer
+        self.names[player] = name
+        if len(self.writers) == self.players:
+            for other in self.writers:
+                self.send(other, encode(START, other, self.players, self.seed,
+                                        self.columns, self.rows, self.gravity_ticks))
+        return player
+
+    def dispatch(self, player, fields):
+        kind = fields[0]
+        if kind in (INPUT, SYNC, RECEIVED):
+            self.broadcast(player, MESSAGES[kind].pack(*fields))
+        elif kind == ATTACK:
+            if not 0 < fields[3] <= MAX_GARBAGE_LINES:
+                return
+            routed = self.router.route(player)
+            if routed is not None:
+                target, hole = routed
+                self.send(target, encode(GARBAGE, target, player, fields[3], hole))
+        elif kind == TOPOUT:
+            self.broadcast(player, MESSAGES[kind].pack(*fields))
+            self.eliminate(player)
+
+    # 淘汰玩家 (結束或斷線)，只剩一人時宣布勝利者
+    def eliminate(self, player):
+        if player not in self.router.alive:
+            return
+        self.router.eliminate(player)
+        if len(self.router.alive) <= 1 and not self.finished.is_set():
+            self.winner = self.router.alive[0] if self.router.alive else NO_WINNER
+            for other in self.writers:
+                self.send(other, encode(END, self.winner))
+            self.finished.set()
+
+    # 寫入時不等待 drain；對方停止讀取而累積過多資料時直接斷線，單一慢速玩家不會卡住事件迴圈
+    def send(self, player, data):
+        writer = self.writers.get(player)
+        if writer is None or writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            writer.close()
+            return
+        writer.write(data)
+
+    def broadcast(self, source, data):
+        for player in self.writers:
+            if player != source:
+                self.send(player, data)
+
+# 對戰客戶端：在本地以固定時間步長推進自己的遊戲 (由策略操作)，送出輸入與攻擊，
+# 並以收到的事件維護對手的鏡像；rate 為每秒 tick 數 (測試時可加快)。
+# view(game, opponents) 在每個 tick 推進之前呼叫 (例如 Tetris.KeyboardPlayer.frame)，回傳 False 時離開對戰
+class VersusClient:
+    def __init__(self, name, policy='engine:random_policy', seed=0, rate=engine.TICKS_PER_SECOND, view=None):
+        self.name = name
+        self.policy = load_policy(policy)
+        self.view = view
+        self.rng = random.Random(seed)
+        self.rate = rate
+        self.reader = None
+        self.writer = None
+        self.player = None
+        self.game = None
+        self.mirrors = {}
+        self.winner = None
+        self.started = None
+        self.ended = None
+        self.start_time = 0.0
+        self.last_sent = 0
+        self.sent = 0
+        self.received = 0
+        self.latencies = []
+        self.max_lag = 0.0
+
+    async def connect(self, address):
+        self.started = asyncio.Event()
+        self.ended = asyncio.Event()
+        self.reader, self.writer = await open_connection(address)
+        self.writer.write(encode_join(self.name))
+
+    # 對手的 [(名稱, 鏡像的遊戲), ...]
+    def opponents(self):
+        return [(f"P{player + 1}", mirror.game) for player, mirror in sorted(self.mirrors.items())]
+
+    # 錄影器介面：遊戲套用動作時立即送出
+    def record(self, tick, action):
+        self.writer.write(encode(INPUT, self.player, tick, action))
+        self.last_sent = tick
+
+    # 玩完一場：等待開始，之後每個 tick 推進一次直到伺服器宣布結束
+    async def run(self):
+        reading = asyncio.create_task(self.read_loop())
+        try:
+            await self.started.wait()
+            loop = asyncio.get_running_loop()
+            tick_seconds = 1 / self.rate
+            next_tick = loop.time()
+            while not self.ended.is_set():
+                game = self.game
+                if self.view is not None and not self.view(game, self.opponents()):
+                    break
+                if game.running:
+                    game.step(self.policy(game, self.rng))
+                    attack = game.take_attack()
+                    if attack:
+                        self.writer.write(encode(ATTACK, self.player, game.tick, attack))
+                        self.sent += attack
+                    if game.game_over:
+                        self.writer.write(encode(TOPOUT, self.player, game.tick, game.state_hash()))
+                    elif game.tick - self.last_sent >= SYNC_TICKS:
+                        self.writer.write(encode(SYNC, self.player, game.tick))
+                        self.last_sent = game.tick
+                next_tick += tick_seconds
+                delay = next_tick - loop.time()
+                self.max_lag = max(self.max_lag, -delay)
+                # 落後超過 8 個 tick 時放棄追趕
+                if delay < -8 * tick_seconds:
+                    next_tick = loop.time()
+                await asyncio.sleep(max(0.0, delay))
+        finally:
+            reading.cancel()
+            self.writer.close()
+
+    async def read_loop(self):
+        buffer = bytearray()
+        while True:
+            data = await self.reader.read(READ_SIZE)
+            if not data:
+                self.ended.set()
+                return
+            buffer += data
+            messages, used = parse_messages(buffer)
+            del buffer[:used]
+            for fields in messages:
+                self.handle(fields)
+
+    def handle(self, fields):
+        kind = fields[0]
+        if kind == START:
+            kind, self.player, players, seed, columns, rows, gravity_ticks = fields
+            self.game = engine.Game(seed, columns, rows, gravity_ticks)
+            self.game.recorder = self
+            self.game.running = True
+            self.mirrors = {player: Mirror(seed, columns, rows, gravity_ticks)
+                            for player in range(players) if player != self.player}
+            self.start_time = time.perf_counter()
+            self.started.set()
+        elif kind == GARBAGE:
+            kind, target, source, lines, hole = fields
+            game = self.game
+            if game is not None and game.running and valid_garbage(lines, hole, game.columns):
+                game.receive_garbage(lines, hole)
+                self.writer.write(encode(RECEIVED, self.player, game.tick, lines, hole))
+                self.received += lines
+        elif kind == END:
+            self.winner = fields[1]
+            if self.game is not None:
+                self.game.running = False
+            self.ended.set()
+        else:
+            mirror = self.mirrors.get(fields[1])
+            if mirror is None:
+                return
+            tick = fields[2]
+            # 依 tick 戳記換算事件應發生的時間，記錄送達的延遲
+            self.latencies.append(time.perf_counter() - self.start_time - tick / self.rate)
+            if kind == INPUT:
+                mirror.input(tick, fields[3])
+            elif kind == SYNC:
+                mirror.advance(tick)
+            elif kind == RECEIVED:
+                if valid_garbage(fields[3], fields[4], mirror.game.columns):
+                    mirror.garbage(tick, fields[3], fields[4])
+            elif kind == TOPOUT:
+                mirror.top_out(tick, fields[3])
+
+# 測試用的替身伺服器：在同一個事件迴圈中啟動伺服器與 players 個機器人客戶端，打完一場後回傳
+async def run_loopback(players, seed=None, policy='engine:random_policy', address='127.0.0.1:0',
+                       rate=engine.TICKS_PER_SECOND, **kwargs):
+    server = VersusServer(players, seed, **kwargs)
+    address = await server.start(address)
+    clients = [VersusClient(f"bot{i}", policy, i, rate) for i in range(players)]
+    try:
+        for client in clients:
+            await client.connect(address)
+        await asyncio.gather(*(client.run() for client in clients))
+    finally:
+        await server.close()
+    return server, clients
+
+# 彙整一場網路對戰的結果
+def summarize_clients(winner, clients):
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    return {
+        'winner': winner,
+        'lines_sent': [client.sent for client in clients],
+        'lines_received': [client.received for client in clients],
+        'desyncs': sum(not mirror.in_sync for client in clients for mirror in client.mirrors.values()),
+        'events': len(latencies),
+        'latency_p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_tick_lag_ms': max(client.max_lag for client in clients) * 1000,
+    }
+
+def print_summary(summary):
+    for key, value in summary.items():
+        if isinstance(value, float):
+            print(f"{key:>16}: {value:,.2f}")
+        else:
+            print(f"{key:>16}: {value}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tetris versus mode")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    local = subparsers.add_parser('local', help="Play a match between bots in one process")
+    local.add_argument('--players', type=int, default=2)
+    local.add_argument('--policy', default='engine:random_policy')
+    local.add_argument('--seed', type=int)
+
+    server = subparsers.add_parser('server', help="Host a match")
+    server.add_argument('--players', type=int, default=2)
+    server.add_argument('--address', default='127.0.0.1:7777', help="host:port or unix:path")
+    server.add_argument('--seed', type=int)
+
+    bot = subparsers.add_parser('bot', help="Join a match with a bot")
+    bot.add_argument('--address', default='127.0.0.1:7777')
+    bot.add_argument('--name', default='bot')
+    bot.add_argument('--policy', default='engine:random_policy')
+    bot.add_argument('--seed', type=int, default=0)
+
+    play = subparsers.add_parser('play', help="Play a match from the keyboard against bots in one process")
+    play.add_argument('--players', type=int, default=2)
+    play.add_argument('--policy', default='engine:random_policy')
+    play.add_argument('--seed', type=int)
+
+    human = subparsers.add_parser('human', help="Join a match from the keyboard")
+    human.add_argument('--address', default='127.0.0.1:7777')
+    human.add_argument('--name', default='player')
+
+    loopback = subparsers.add_parser('loopback', help="Run a server and bots in one event loop")
+    loopback.add_argument('--players', type=int, default=2)
+    loopback.add_argument('--policy', default='engine:random_policy')
+    loopback.add_argument('--address', default='127.0.0.1:0')
+    loopback.add_argument('--rate', type=int, default=engine.TICKS_PER_SECOND)
+    loopback.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'local':
+        policy = load_policy(args.policy)
+        match = play_match([policy] * args.players, args.seed)
+        print_summary({
+            'winner': match.winner,
+            'ticks': match.games[0].tick,
+            'lines_sent': match.sent,
+            'lines': [game.lines for game in match.games],
+        })
+    elif args.command == 'server':
+        async def serve():
+            versus = VersusServer(args.players, args.seed)
+            print(f"Listening on {await versus.start(args.address)}")
+            await versus.wait()
+            await versus.close()
+            print(f"Winner: {versus.names.get(versus.winner, '-')}")
+        asyncio.run(serve())
+    elif args.command == 'play':
+        match = play_keyboard_match(args.players, args.policy, args.seed)
+        print_summary({
+            'winner': match.winner,
+            'ticks': match.games[0].tick,
+            'lines_sent': match.sent,
+        })
+    elif args.command == 'human':
+        import Tetris
+        keyboard = Tetris.KeyboardPlayer(args.name)
+        async def play():
+            client = VersusClient(args.name, keyboard.policy, view=keyboard.frame)
+            await client.connect(args.address)
+            await client.run()
+            return client
+        client = asyncio.run(play())
+        # 對戰結束後畫面停在結果，直到關閉視窗
+        while keyboard.frame(client.game, client.opponents()):
+            time.sleep(1 / engine.TICKS_PER_SECOND)
+        print_summary(summarize_clients(client.winner, [client]))
+    elif args.command == 'bot':
+        async def play():
+            client = VersusClient(args.name, args.policy, args.seed)
+            await client.connect(args.address)
+            await client.run()
+            return client
+        client = asyncio.run(play())
+        print_summary(summarize_clients(client.winner, [client]))
+    else:
+        versus, clients = asyncio.run(run_loopback(args.players, args.seed, args.policy,
+                                                   args.address, args.rate))
+        print_summary(summarize_clients(versus.winner, clients))
+
+if __name__ == "__main__":
+    main()